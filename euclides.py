@@ -6,14 +6,40 @@ import random
 import shelve
 import enum
 import bisect
+import argparse
+import json
+import collections.abc
+import asyncio
+import threading
+import socket
+import struct
+import itertools
+import operator
+import functools
+import weakref
+import os
+import timeit
+import http.server
+import sys
+import statistics
+import hashlib
+import mmap
+import concurrent.futures
 from tkinter import *
 from tkinter import messagebox
+try:
+    import numpy
+except ImportError:  # collisions fall back to plain python
+    numpy = None
 
 
 PI = math.pi
 START_TIME = time.get_ticks()
 
-SCREEN_SIZE = SCREEN_WIDTH, SCREEN_HEIGHT = (800, 600)
+SCREEN_SIZE = SCREEN_WIDTH, SCREEN_HEIGHT = (800, 600)  # logical resolution, all positions are relative to it
+RENDER_SCALE = 1  # render resolution relative to the logical resolution
+HALF_RESOLUTION = 0.5  # render scale of low-power cabinets
+TEXT_CACHE_SIZE = 256  # number of rendered texts kept in the cache
 
 BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
@@ -32,8 +58,10 @@ ENEMY_SIZE_DECREMENT = -5
 ENEMY_STARTING_SPEED = 2.5
 ENEMY_SPEED_INCREMENT = 0.5
 ENEMY_STARTING_VERTICES = 4
+ENEMY_MIN_SIZE = 20  # enemies don't shrink below this size
 ENEMY_WAVE_STARTING_FIRE_COOLDOWN = 2000
 ENEMY_WAVE_FIRE_COOLDOWN_DECREMENT = 100
+ENEMY_WAVE_MIN_FIRE_COOLDOWN = 250  # wave never fires faster than this (milliseconds)
 ENEMY_PROJECTILE_STARTING_SPEED = 10
 ENEMY_PROJECTILE_SPEED_INCREMENT = 0.2
 
@@ -48,22 +76,83 @@ FAME_POS = (400, 280)
 SCORE_HULL_DAMAGE = 10  # multiplied by vertices of the enemy
 SCORE_DESTROY_ENEMY = 100  # multiplied by vertices of the enemy
 
+SPECTATOR_HOST = "127.0.0.1"  # spectators are served on the local machine only
+SPECTATOR_KEYFRAME_INTERVAL = 60  # ticks between two full snapshots, other ticks are sent as deltas
+SPECTATOR_BUFFER = 64 * 1024  # a spectator with more unsent bytes than this skips frames
+SPECTATOR_BATCH = 64  # below this many entities the deltas aren't worth vectorizing
+
+METRICS_HOST = "127.0.0.1"  # metrics are served on the local machine only
+METRICS_INTERVAL = 5  # the metrics file is refreshed this often (seconds)
+METRICS_BUCKETS = 0.001, 0.002, 0.004, 0.008, 0.0167, 0.0333, 0.05, 0.1, 0.25, 1  # histogram buckets (seconds)
+
+AUTOSAVE_COOLDOWN = 5000  # the running game is saved this often, if a save file is given (milliseconds)
+
 HOF_FILE = "halloffame"  # .db extension added by shelve
 HOF_CHART = 10  # number of entries in the hall of fames
 HOF_DEFAULT_NAME = "ROLI"
 HOF_DEFAULT_SCORE = 1000
 
+TITLE_FONT = "font/RubikMonoOne-Regular.ttf"
+TEXT_FONT = "font/ShareTechMono-Regular.ttf"
+SCORE_FONT = "font/Monofett-Regular.ttf"
+
 GUNSHOOT = "wav/gunshoot.wav"
 EXPLOSION = "wav/explosion.wav"
 ENEMY_HULL_DAMAGE = "wav/enemy_hull_damage.wav"
 BOUNCE_OFF = "wav/bounce_off.wav"
+ENGINE_STARTUP = "wav/engine_startup.wav"
+ENERGY_HUM = "wav/energy_hum.wav"
 
 TITLE_MUSIC = "wav/title_music.wav"
 OVER_MUSIC = "wav/over_music.wav"
+MUSIC_VOLUME = 0.2
+MUSIC_CROSSFADE = 500  # time to crossfade between tracks (milliseconds)
+
+WAVE_PREWARM_STEPS = 2  # pieces of work (an atlas image or an enemy) done for the next wave on each frame
+ROTATION_STEP = 2  # polygon rotations are cached in this many degree steps
+NARROWPHASE_BATCH = 8  # below this many candidate pairs the polygon test isn't worth vectorizing
+
+ASSET_CACHE_VERSION = 1  # increase when the layout of the baked files changes
+BAKE_WAVES = 30  # shapes of this many waves are baked, later ones are rendered at runtime
+BAKED_FONTS = (TITLE_FONT, 60), (TITLE_FONT, 40), (TEXT_FONT, 30), (TEXT_FONT, 24), (TEXT_FONT, 18), (SCORE_FONT, 40)
+GLYPHS = "".join(map(chr, range(32, 127)))  # characters of the baked glyph strips
 
 EXPLOSION_COOLDOWN = 50
 EXPLOSION_SCALE = 0.8
 
+PARTICLE_CAPACITY = 50000  # particles alive at once, new ones replace the oldest
+PARTICLE_DRAG = 0.94  # particles keep this much of their speed on each tick
+SPARKS = 12  # particles emitted on a hit
+SPARK_SPEED = 5
+SPARK_LIFE = 15  # ticks
+DEBRIS = 40  # particles emitted on each explosion frame
+DEBRIS_SPEED = 3
+DEBRIS_LIFE = 45  # ticks
+
+FRAME_BUDGET = 1000 / FPS  # time available for one frame (milliseconds)
+PROJECTILE_BUDGET = 40  # max number of enemy projectiles on screen
+PROJECTILE_MIN_BUDGET = 8  # the governor never throttles below this
+GOVERNOR_SMOOTHING = 0.1  # weight of the last frame in the averaged frame time
+GOVERNOR_BACKOFF = 0.75  # budget is multiplied by this on an overloaded frame
+QUALITY_COARSE_ROTATION = 1  # from this quality level polygons rotate in coarser steps
+QUALITY_FEWER_EXPLOSION_FRAMES = 2  # from this level explosions skip frames
+QUALITY_LAZY_TEXT = 3  # from this level unchanged texts are redrawn only now and then
+QUALITY_SINGLE_SOUNDS = 4  # from this level a hit sound isn't played again while it's playing
+QUALITY_LOWEST = 4
+QUALITY_ROTATION_STEP = 3 * ROTATION_STEP  # rotation bucket of coarse rotation (degrees)
+QUALITY_EXPLOSION_STEP = 2  # explosion frames advanced at once
+QUALITY_TEXT_REDRAW = 30  # frames an unchanged text may be skipped for
+QUALITY_DEGRADE_FRAMES = 30  # frames over budget in a row before the quality is degraded
+QUALITY_RESTORE_FRAMES = 180  # frames with headroom in a row before the quality is restored
+QUALITY_HEADROOM = 0.5  # there is headroom, when the frame time is below this share of the budget
+BENCHMARK_WAVE = 25  # the benchmark starts at this wave
+BENCHMARK_SEED = 25  # random seed of the benchmark, every run plays the same waves
+PROFILE_BUDGET = 2 * FRAME_BUDGET  # frames longer than this trigger a capture (milliseconds)
+PROFILE_FRAMES = 30  # frames captured after a spike
+PROFILE_HISTORY = 300  # frame timings kept in the ring buffer
+PROFILE_INTERVAL = 0.001  # time between two call stack samples (seconds)
+PROFILE_COOLDOWN = 10  # min time between two captures (seconds)
+
 
 def knockback(update:callable) -> callable:
     """Decorator function.
@@ -135,8 +224,9 @@ def follow_mouse(update:callable) -> callable:
         """Call the update function and follow the mouse cursor in play mode."""
         state = kwargs.pop("state", None)
         if state == State.PLAY:
-            self._dx = (mouse.get_pos()[0] - self._rect.centerx) // 2
-            self._dy = (mouse.get_pos()[1] - self._rect.centery) // 2
+            mouse_x, mouse_y = kwargs["controls"].mouse_pos
+            self._dx = (mouse_x - self._rect.centerx) // 2
+            self._dy = (mouse_y - self._rect.centery) // 2
         update(self, *args, **kwargs)
     return wrapper
 
@@ -181,6 +271,8 @@ class Trig:
 
 class Timer:
     """Timer for the game."""
+    SNAPSHOT_FORMAT = "fIi"  # cooldown, counter, time elapsed since the last update
+
     def __init__(self, cooldown:int) -> None:
         """Initialize a timer object.
         cooldown:  time in milliseconds between each update"""
@@ -211,6 +303,19 @@ class Timer:
         """Reset the counter."""
         self._counter = 1
 
+    def dump(self) -> tuple:
+        """Return the state of the timer to be saved, in the order of SNAPSHOT_FORMAT."""
+        return self._cooldown, self._counter, time.get_ticks() - self._last_update
+
+    def load(self, cooldown:float, counter:int, elapsed:int) -> None:
+        """Restore the state of the timer.
+        cooldown:   time in milliseconds between each update
+        counter:    counter
+        elapsed:    time in milliseconds elapsed since the last update"""
+        self._cooldown = cooldown
+        self._counter = counter
+        self._last_update = time.get_ticks() - elapsed
+
     def is_ready(self) -> bool:
         """Check if the timer is ready for an action."""
         self._counter += 1
@@ -219,9 +324,649 @@ class Timer:
         return time_since_last_update >= self._cooldown
 
 
+class Display:
+    """The game renders into a surface of the logical resolution multiplied by the render scale.
+    This surface is presented scaled to the window, with integer upscaling whenever the window allows it."""
+    scale = RENDER_SCALE  # actual render scale, sprites render their images at this scale
+
+    def __init__(self, scale:float=RENDER_SCALE, window_size:tuple=None, fullscreen:bool=False) -> None:
+        """Initialize the display.
+        scale:          render resolution relative to the logical resolution
+        window_size:    tuple of width, height of the window, defaults to the logical resolution
+        fullscreen:     use the whole screen instead of a window"""
+        Display.scale = scale
+        render_size = round(SCREEN_WIDTH * scale), round(SCREEN_HEIGHT * scale)
+        if window_size is None:
+            window_size = (0, 0) if fullscreen else SCREEN_SIZE
+        self._window = pygame.display.set_mode(window_size, FULLSCREEN if fullscreen else 0)
+        window_width, window_height = self._window.get_size()
+        factor = min(window_width / render_size[0], window_height / render_size[1])
+        if factor >= 1:
+            factor = int(factor)  # integer upscaling keeps pixels sharp
+        self._factor = factor
+        self._viewport = pygame.Rect(0, 0, round(render_size[0] * factor), round(render_size[1] * factor))
+        self._viewport.center = self._window.get_rect().center
+        if self._viewport.size == render_size and self._viewport.topleft == (0, 0):
+            self._surface = self._window  # nothing to scale, render right into the window
+        else:
+            self._surface = pygame.Surface(render_size)
+            self._scaled = self._window.subsurface(self._viewport)  # scaled output is cached on the window
+
+    @property
+    def surface(self) -> pygame.Surface:
+        """Return the render surface."""
+        return self._surface
+
+    def mouse_pos(self) -> tuple:
+        """Return the mouse cursor's position in logical coordinates."""
+        x, y = mouse.get_pos()
+        ratio = self._factor * Display.scale
+        return int((x - self._viewport.x) / ratio), int((y - self._viewport.y) / ratio)
+
+    def present(self, changed:list) -> None:
+        """Show the changed areas of the render surface on the window.
+        changed:    list of changed rects on the render surface"""
+        if self._surface is self._window:
+            pygame.display.update(changed)
+            return
+        if not isinstance(self._factor, int):  # partial areas wouldn't line up, scale the whole frame
+            pygame.transform.scale(self._surface, self._viewport.size, self._scaled)
+            pygame.display.update(self._viewport)
+            return
+        updated = []
+        bounds = self._surface.get_rect()
+        for rect in changed:
+            rect = rect.clip(bounds)
+            if not rect:
+                continue
+            target = pygame.Rect(rect.x * self._factor, rect.y * self._factor,
+                                 rect.width * self._factor, rect.height * self._factor)
+            pygame.transform.scale(self._surface.subsurface(rect), target.size, self._scaled.subsurface(target))
+            updated.append(target.move(self._viewport.topleft))
+        pygame.display.update(updated)
+
+
+class MusicManager:
+    """Background music of the game.
+    The tracks are decoded into memory once and each plays on its own reserved channel, so switching tracks never
+    touches the disk. Tracks crossfade, with volumes driven by the game clock. Missing music files are skipped,
+    playing them does nothing."""
+    def __init__(self, *tracks:str, volume:float=MUSIC_VOLUME, crossfade:int=MUSIC_CROSSFADE) -> None:
+        """Load the tracks, which exist.
+        tracks:     paths to music files
+        volume:     volume of the music
+        crossfade:  time to crossfade between tracks in milliseconds"""
+        tracks = [track for track in dict.fromkeys(tracks) if os.path.exists(track)]
+        mixer.set_reserved(len(tracks))  # sound effects never steal the music's channels
+        self._tracks = {track: (AssetCache.sound(track), mixer.Channel(i)) for i, track in enumerate(tracks)}
+        self._volume = volume
+        self._crossfade = crossfade
+        self._track = None
+        self._fade_start = None
+        self._fade_from = {}  # volumes of the channels when the crossfade started
+        self._transitions = 0
+        self._latency = 0.0
+        self._latency_max = 0.0
+
+    @property
+    def track(self) -> str:
+        """Return the track actually playing, or None."""
+        return self._track
+
+    @property
+    def metrics(self) -> dict:
+        """Return the music's metrics."""
+        return {
+            "music_transition_latency_ms": round(self._latency, 3),
+            "music_transition_latency_max_ms": round(self._latency_max, 3),
+            "music_crossfading": self._fade_start is not None,
+        }
+
+    @property
+    def counters(self) -> dict:
+        """Return the music's ever growing counts as metrics."""
+        return {"music_transitions": self._transitions}
+
+    def play(self, track:str) -> None:
+        """Crossfade to the track, restarting it from the beginning. A missing track isn't played.
+        track:  path of a music file"""
+        if track not in self._tracks:
+            return
+        started = time.get_ticks()
+        clock = timeit.default_timer()
+        sound, channel = self._tracks[track]
+        channel.play(sound, loops=-1)
+        channel.set_volume(0)
+        self._start_fade(track, started)
+        self._latency = (timeit.default_timer() - clock) * 1000
+        self._latency_max = max(self._latency_max, self._latency)
+
+    def stop(self) -> None:
+        """Fade out the music, if any is playing."""
+        if self._track is None:
+            return
+        self._start_fade(None, time.get_ticks())
+
+    def update(self) -> None:
+        """Advance the crossfade. Call it on every frame."""
+        if self._fade_start is None:
+            return
+        progress = min(1, (time.get_ticks() - self._fade_start) / self._crossfade) if self._crossfade else 1
+        for track, (sound, channel) in self._tracks.items():
+            target = self._volume if track == self._track else 0
+            channel.set_volume(self._fade_from[track] + (target - self._fade_from[track]) * progress)
+            if progress == 1 and not target:
+                channel.stop()
+        if progress == 1:
+            self._fade_start = None
+
+    def _start_fade(self, track:str, now:int) -> None:
+        """Start a crossfade to the track.
+        track:  path of a loaded music file or None for silence
+        now:    game clock in milliseconds"""
+        self._fade_from = {name: channel.get_volume() if channel.get_busy() else 0
+                           for name, (_, channel) in self._tracks.items()}
+        self._track = track
+        self._fade_start = now
+        self._transitions += 1
+        self.update()
+
+
+# immutable snapshot of the user's input during a tick: mouse cursor's position in logical coordinates, state of the
+# mouse buttons, whether a mouse button went down or up, keys pressed down and whether the window has been closed
+Controls = collections.namedtuple("Controls", "mouse_pos buttons pressed released keys quit",
+                                  defaults=((0, 0), (False, False, False), False, False, (), False))
+
+
+class Input:
+    """Input of the game, sampled once per tick.
+    The event queue is restricted to the events the game uses, so floods of mouse motion don't have to be drained."""
+    EVENTS = QUIT, KEYDOWN, MOUSEBUTTONDOWN, MOUSEBUTTONUP
+
+    def __init__(self, display:Display) -> None:
+        """Initialize the input.
+        display:    display to map the mouse cursor's position to logical coordinates"""
+        self._display = display
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(Input.EVENTS)
+
+    def poll(self) -> Controls:
+        """Return the controls of this tick."""
+        pressed = released = closed = False
+        keys = []
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                closed = True
+            elif event.type == KEYDOWN:
+                keys.append(event.key)
+            elif event.type == MOUSEBUTTONDOWN:
+                pressed = True
+            elif event.type == MOUSEBUTTONUP:
+                released = True
+        return Controls(self._display.mouse_pos(), mouse.get_pressed(), pressed, released, tuple(keys), closed)
+
+
+class ScriptedInput(Input):
+    """Input played from a script instead of the user, for headless runs."""
+    def __init__(self, script:collections.abc.Iterable) -> None:
+        """Initialize the input.
+        script: iterable of Controls, one for each tick; the window is closed when it runs out"""
+        self._script = iter(script)
+
+    def poll(self) -> Controls:
+        """Return the controls of this tick."""
+        pygame.event.pump()  # keep the window responsive
+        return next(self._script, Controls(quit=True))
+
+
+class Governor:
+    """Keep enemy fire predictable and frame time bounded.
+    The governor enforces a budget of enemy projectiles and a minimum fire cooldown. Both adapt to the measured
+    frame time: an overloaded frame shrinks the budget and stretches the cooldown, headroom restores them."""
+    def __init__(self, budget:int=PROJECTILE_BUDGET, min_cooldown:int=ENEMY_WAVE_MIN_FIRE_COOLDOWN,
+                 frame_budget:float=FRAME_BUDGET, pinned_cooldown:int=None) -> None:
+        """Initialize the governor.
+        budget:             max number of enemy projectiles on screen
+        min_cooldown:       min time between two enemy shots in milliseconds
+        frame_budget:       time available for one frame in milliseconds
+        pinned_cooldown:    fixed time between two enemy shots in milliseconds, e.g. for a steady load"""
+        self._max_budget = budget
+        self._budget = budget
+        self._min_cooldown = min_cooldown
+        self._pinned_cooldown = pinned_cooldown
+        self._frame_budget = frame_budget
+        self._frame_time = 0.0
+        self._granted = 0
+        self._denied = 0
+        self._throttled = 0
+
+    @property
+    def budget(self) -> int:
+        """Return the actual number of enemy projectiles allowed on screen."""
+        return self._budget
+
+    @property
+    def min_cooldown(self) -> int:
+        """Return the actual minimum fire cooldown in milliseconds, stretched by the throttling."""
+        return self._min_cooldown * self._max_budget // self._budget
+
+    @property
+    def starting_cooldown(self) -> int:
+        """Return the fire cooldown of a new wave in milliseconds."""
+        return ENEMY_WAVE_STARTING_FIRE_COOLDOWN if self._pinned_cooldown is None else self._pinned_cooldown
+
+    @property
+    def frame_time(self) -> float:
+        """Return the averaged frame time in milliseconds."""
+        return self._frame_time
+
+    @property
+    def metrics(self) -> dict:
+        """Return the governor's decisions as metrics."""
+        return {
+            "governor_frame_time_ms": round(self._frame_time, 2),
+            "governor_projectile_budget": self._budget,
+            "governor_min_cooldown_ms": self.min_cooldown,
+        }
+
+    @property
+    def counters(self) -> dict:
+        """Return the governor's decisions counted so far as metrics."""
+        return {
+            "governor_shots_granted": self._granted,
+            "governor_shots_denied": self._denied,
+            "governor_throttled_frames": self._throttled,
+        }
+
+    def measure(self, frame_time:int) -> None:
+        """Adapt the budget to the measured frame time.
+        frame_time: time spent on the last frame in milliseconds, excluding the clock's delay"""
+        self._frame_time += (frame_time - self._frame_time) * GOVERNOR_SMOOTHING
+        if self._frame_time > self._frame_budget:
+            self._budget = max(PROJECTILE_MIN_BUDGET, int(self._budget * GOVERNOR_BACKOFF))
+            self._throttled += 1
+        elif self._budget < self._max_budget:
+            self._budget += 1
+
+    def allows_fire(self, projectiles:int) -> bool:
+        """Return True if an other enemy projectile fits into the budget, otherwise False.
+        projectiles:    number of enemy projectiles on screen"""
+        if projectiles < self._budget:
+            self._granted += 1
+            return True
+        self._denied += 1
+        return False
+
+    def cool_down(self, timer:Timer) -> None:
+        """Shorten the fire cooldown after a shot, but never below the minimum. A pinned cooldown is kept as it is.
+        timer:  fire rate timer of the wave"""
+        if self._pinned_cooldown is not None:
+            timer.cooldown = self._pinned_cooldown
+            return
+        timer.cooldown = max(self.min_cooldown, timer.cooldown - ENEMY_WAVE_FIRE_COOLDOWN_DECREMENT)
+
+
+class Quality:
+    """Render quality, degraded step by step when frames run over budget, and restored when headroom comes back.
+    Each level keeps the savings of the levels below. Restoring waits longer than degrading, so the level doesn't
+    flap around the budget."""
+    level = 0  # actual quality level, sprites render accordingly; 0 is the full quality
+
+    def __init__(self, adaptive:bool=True, frame_budget:float=FRAME_BUDGET) -> None:
+        """Initialize the quality at its full level.
+        adaptive:       adapt the quality to the frame time, otherwise keep the full quality
+        frame_budget:   time available for one frame in milliseconds"""
+        Quality.level = 0
+        self._adaptive = adaptive
+        self._frame_budget = frame_budget
+        self._over = 0  # frames over budget in a row
+        self._under = 0  # frames with headroom in a row
+        self._degraded = 0
+        self._restored = 0
+
+    @property
+    def metrics(self) -> dict:
+        """Return the quality level as metrics."""
+        return {"quality_level": Quality.level}
+
+    @property
+    def counters(self) -> dict:
+        """Return the changes of the quality level counted so far as metrics."""
+        return {
+            "quality_degraded": self._degraded,
+            "quality_restored": self._restored,
+        }
+
+    def measure(self, frame_time:float) -> None:
+        """Adapt the quality level to the frame time.
+        frame_time: averaged frame time in milliseconds, excluding the clock's delay"""
+        if not self._adaptive:
+            return
+        if frame_time > self._frame_budget:
+            self._over, self._under = self._over + 1, 0
+        elif frame_time < self._frame_budget * QUALITY_HEADROOM:
+            self._over, self._under = 0, self._under + 1
+        else:
+            self._over = self._under = 0
+        if self._over >= QUALITY_DEGRADE_FRAMES and Quality.level < QUALITY_LOWEST:
+            Quality.level += 1
+            self._degraded += 1
+            self._over = 0
+        elif self._under >= QUALITY_RESTORE_FRAMES and Quality.level > 0:
+            Quality.level -= 1
+            self._restored += 1
+            self._under = 0
+
+
+class Atlas:
+    """Collection of rendered polygon images.
+    Images are keyed by shape, rotation bucket, color and render scale, so every image is rasterised only once."""
+    _images = {}
+
+    def bucket(n:int, angle:float) -> int:
+        """Return the rotation bucket of the angle. A regular polygon looks the same after turning 360/n degrees.
+        Buckets are coarser on degraded quality, but always a subset of the full quality buckets.
+        n:      number of vertices
+        angle:  rotation angle in degrees"""
+        step = QUALITY_ROTATION_STEP if Quality.level >= QUALITY_COARSE_ROTATION else ROTATION_STEP
+        return int(angle % (360 / n)) // step * step
+
+    def image(n:int, size:int, radius:float, angle:float, color:pygame.Color) -> pygame.Surface:
+        """Return the image of the polygon, rendering it if not cached yet.
+        n:      number of vertices
+        size:   size of containing surface in logical pixels
+        radius: radius of circle inside the surface in logical pixels
+        angle:  rotation angle in degrees
+        color:  color of the outline"""
+        key = n, size, round(radius * Display.scale), Atlas.bucket(n, angle), tuple(color), Display.scale
+        image = Atlas._images.get(key)
+        if image is None:
+            image = AssetCache.image(key)
+            if image is None:
+                image = pygame.Surface((round(size * Display.scale), ) * 2)
+                image.set_colorkey(BLACK)
+                vertices = Trig.vertices(n, image.get_width(), radius * Display.scale, key[3])
+                pygame.draw.polygon(image, color, vertices, 1)
+            Atlas._images[key] = image
+        return image
+
+    def warm(n:int, size:int, color:pygame.Color=WHITE) -> collections.abc.Iterator:
+        """Render every rotation of the polygon in advance, yielding after each image.
+        n:      number of vertices
+        size:   size of containing surface in logical pixels
+        color:  color of the outline"""
+        for angle in range(0, math.ceil(360 / n), ROTATION_STEP):
+            Atlas.image(n, size, size // 2, angle, color)
+            yield
+
+
+class AssetCache:
+    """Assets baked into a cache directory ahead of time.
+    Polygon images and text glyph strips are pre-rendered in a process pool, sounds are converted to raw PCM in the
+    mixer's format. The baked files are memory-mapped at startup, images are wrapped as surfaces without copying.
+    The files are kept in a subdirectory named by a hash of the source assets and every constant the bake depends
+    on, so a stale cache is never loaded."""
+    _images = {}  # offset and width of baked polygon images by atlas key
+    _glyphs = {}  # glyph strip and {character: (x, width, advance)} by (font name, rendered size, color)
+    _sounds = {}  # offset and length of raw sounds by filename
+    _files = {}  # memory maps of the baked files
+
+    def digest(scale:float, waves:str=None) -> str:
+        """Return the hash of everything the baked assets depend on.
+        scale:  render scale the assets are baked for
+        waves:  path to a json file of planned waves"""
+        digest = hashlib.sha1(repr((ASSET_CACHE_VERSION, pygame.version.ver, mixer.get_init(), scale, ROTATION_STEP,
+                                    EXPLOSION_SCALE, PLAYER_SIZE, PLAYER_VERTICES, ENEMY_STARTING_SIZE,
+                                    ENEMY_SIZE_DECREMENT, ENEMY_MIN_SIZE, ENEMY_STARTING_VERTICES, BAKE_WAVES,
+                                    BAKED_FONTS, GLYPHS, AssetCache.sources(waves))).encode())
+        for filename in AssetCache.sources(waves):
+            with open(filename, "rb") as source:
+                digest.update(source.read())
+        return digest.hexdigest()
+
+    def sounds() -> tuple:
+        """Return the sound files to be baked, which exist."""
+        sounds = GUNSHOOT, EXPLOSION, ENEMY_HULL_DAMAGE, BOUNCE_OFF, ENGINE_STARTUP, ENERGY_HUM, TITLE_MUSIC, OVER_MUSIC
+        return tuple(filename for filename in dict.fromkeys(sounds) if os.path.exists(filename))
+
+    def sources(waves:str=None) -> tuple:
+        """Return the source files of the baked assets.
+        waves:  path to a json file of planned waves"""
+        fonts = tuple(dict.fromkeys(font_name for font_name, _ in BAKED_FONTS))
+        return AssetCache.sounds() + fonts + ((waves, ) if waves else ())
+
+    def shapes(waves:str=None) -> list:
+        """Return size, number of vertices and whether it's a ship, for every polygon of the first waves.
+        waves:  path to a json file of planned waves"""
+        plan = WavePlan(waves)
+        shapes = {(PLAYER_SIZE, PLAYER_VERTICES, True), (PLAYER_SIZE // 4, PLAYER_VERTICES, False)}
+        for number in range(1, BAKE_WAVES + 1):
+            size, n, _ = plan.parameters(number)
+            shapes.update({(size, n, True), (size // 4, n, False)})
+        return sorted(shapes)
+
+    def bake(directory:str, scale:float, waves:str=None) -> str:
+        """Bake the assets, unless they're baked already. Return the path of the baked files.
+        directory:  cache directory
+        scale:      render scale the assets are baked for
+        waves:      path to a json file of planned waves"""
+        path = os.path.join(directory, AssetCache.digest(scale, waves))
+        if os.path.exists(path):
+            return path
+        index = {"images": [], "glyphs": [], "sounds": []}
+        baking = path + ".{}".format(os.getpid())
+        os.makedirs(baking)
+        with concurrent.futures.ProcessPoolExecutor() as pool:
+            shapes = pool.map(AssetCache._render_shapes, [shape + (scale, ) for shape in AssetCache.shapes(waves)])
+            strips = pool.map(AssetCache._render_glyphs, [baked + (scale, ) for baked in BAKED_FONTS])
+            with open(os.path.join(baking, "images"), "wb") as images:
+                for key, pixels in itertools.chain.from_iterable(shapes):
+                    index["images"].append((key, images.tell()))
+                    images.write(pixels)
+            with open(os.path.join(baking, "glyphs"), "wb") as glyphs:
+                for key, size, pixels, table in strips:
+                    index["glyphs"].append((key, glyphs.tell(), size, table))
+                    glyphs.write(pixels)
+        with open(os.path.join(baking, "sounds"), "wb") as sounds:
+            for filename in AssetCache.sounds():
+                raw = mixer.Sound(filename).get_raw()
+                index["sounds"].append((filename, sounds.tell(), len(raw)))
+                sounds.write(raw)
+        with open(os.path.join(baking, "index.json"), "w") as index_file:
+            json.dump(index, index_file)
+        os.replace(baking, path)  # the cache appears complete or not at all
+        return path
+
+    def load(directory:str, scale:float, waves:str=None) -> None:
+        """Memory-map the baked assets, baking them first if they're missing or stale.
+        directory:  cache directory
+        scale:      render scale the assets are baked for
+        waves:      path to a json file of planned waves"""
+        path = AssetCache.bake(directory, scale, waves)
+        for name in "images", "glyphs", "sounds":
+            with open(os.path.join(path, name), "rb") as baked:
+                if os.fstat(baked.fileno()).st_size:
+                    AssetCache._files[name] = memoryview(mmap.mmap(baked.fileno(), 0, access=mmap.ACCESS_READ))
+        with open(os.path.join(path, "index.json")) as index_file:
+            index = json.load(index_file)
+        for (n, size, radius, bucket, color, key_scale), offset in index["images"]:
+            AssetCache._images[n, size, radius, bucket, tuple(color), key_scale] = offset
+        for (font_name, font_size, color), offset, (width, height), table in index["glyphs"]:
+            strip = AssetCache._files["glyphs"][offset:offset + width * height * 4]
+            AssetCache._glyphs[font_name, font_size, tuple(color)] = (pygame.image.frombuffer(strip, (width, height),
+                                                                                             "RGBA"), table)
+        AssetCache._sounds = {filename: (offset, length) for filename, offset, length in index["sounds"]}
+
+    def image(key:tuple) -> pygame.Surface:
+        """Return a baked polygon image, or None if it hasn't been baked.
+        key:    atlas key of the image"""
+        offset = AssetCache._images.get(key)
+        if offset is None:
+            return None
+        width = round(key[1] * key[5])
+        image = pygame.image.frombuffer(AssetCache._files["images"][offset:offset + width * width], (width, width),
+                                        "P")
+        image.set_palette([BLACK, key[4]])
+        image.set_colorkey(BLACK)
+        return image
+
+    def text(font_key:tuple, text:str, color:tuple) -> pygame.Surface:
+        """Return a text composed from a baked glyph strip, or None if the strip or a glyph hasn't been baked.
+        font_key:   font name and rendered size
+        text:       text to be composed
+        color:      color of the text"""
+        strip, table = AssetCache._glyphs.get(font_key + (color, ), (None, None))
+        if strip is None or not set(text) <= table.keys():
+            return None
+        _, width, advance = table[text[-1]] if text else (0, 1, 0)
+        width += sum(table[char][2] for char in text[:-1])  # the last glyph may be wider than its advance
+        image = pygame.Surface((max(width, advance), strip.get_height()), SRCALPHA)
+        x = 0
+        for char in text:
+            glyph_x, width, advance = table[char]
+            image.blit(strip, (x, 0), (glyph_x, 0, width, strip.get_height()), BLEND_RGBA_MAX)
+            x += advance
+        return image
+
+    def sound(filename:str) -> mixer.Sound:
+        """Return a sound, from the baked raw PCM if it's been baked, otherwise decoded from its file.
+        filename:   path of the sound file"""
+        baked = AssetCache._sounds.get(filename)
+        if baked is None:
+            return mixer.Sound(filename)
+        offset, length = baked
+        return mixer.Sound(buffer=AssetCache._files["sounds"][offset:offset + length])
+
+    def _render_shapes(shape:tuple) -> list:
+        """Render every image of a shape in a worker process. Return the atlas keys and pixels.
+        Ships are rendered in each color of their damage and in each frame of their explosion.
+        shape:  size, number of vertices, whether it's a ship and render scale"""
+        size, n, ship, scale = shape
+        radius = size // 2
+        looks = [(radius, (255, 255, 255, 255))]  # in the order the game renders them, the first one wins a key
+        if ship:
+            color = pygame.Color(WHITE)
+            for hull in range(n - 1, -1, -1):  # shaded as in Spaceship.damage
+                color = color.lerp(BLACK, 1 / (hull + 1))
+                looks.append((radius, tuple(color)))
+            for _ in range(n + 1):  # shrinking as in Spaceship.explode, shaded back to white
+                radius *= EXPLOSION_SCALE
+                looks.append((radius, (255, 255, 255, 255)))
+        width = round(size * scale)
+        rendered = {}
+        for radius, color in looks:
+            for angle in range(0, math.ceil(360 / n), ROTATION_STEP):
+                key = n, size, round(radius * scale), Atlas.bucket(n, angle), color, scale
+                if key not in rendered:
+                    image = pygame.Surface((width, width), 0, 8)
+                    image.set_palette([BLACK, color])
+                    pygame.draw.polygon(image, 1, Trig.vertices(n, width, radius * scale, key[3]), 1)
+                    rendered[key] = pygame.image.tobytes(image, "P")
+        return list(rendered.items())
+
+    def _render_glyphs(baked:tuple) -> tuple:
+        """Render the glyph strip of a font in a worker process. Return its key, size, pixels and glyph table.
+        baked:  font name, size and render scale"""
+        font_name, font_size, scale = baked
+        font.init()
+        font_key = font_name, max(1, round(font_size * scale))
+        typeface = font.Font(*font_key)
+        glyphs = [(char, typeface.render(char, True, WHITE), typeface.metrics(char)[0][4]) for char in GLYPHS]
+        strip = pygame.Surface((sum(glyph.get_width() for _, glyph, _ in glyphs),
+                                max(glyph.get_height() for _, glyph, _ in glyphs)), SRCALPHA)
+        table = {}
+        x = 0
+        for char, glyph, advance in glyphs:
+            table[char] = x, glyph.get_width(), advance
+            strip.blit(glyph, (x, 0))
+            x += glyph.get_width()
+        return font_key + (WHITE, ), strip.get_size(), pygame.image.tobytes(strip, "RGBA"), table
+
+
+class Particles:
+    """Debris and sparks of the spaceships.
+    Position, velocity, lifetime and color of the particles are kept in fixed-capacity numpy ring buffers, one array
+    for each component, as gathering rows of 2d arrays is slow. All particles are moved in one vectorized step and
+    drawn in one batched pass right onto the pixels of the surface."""
+    def __init__(self, capacity:int=PARTICLE_CAPACITY) -> None:
+        """Initialize the buffers.
+        capacity:   max number of particles alive at once"""
+        self._capacity = capacity
+        self._x, self._y, self._dx, self._dy = (numpy.zeros(capacity, dtype=numpy.float32) for _ in range(4))
+        self._life = numpy.zeros(capacity, dtype=numpy.float32)  # remaining ticks, dead if not positive
+        self._lifetime = numpy.ones(capacity, dtype=numpy.float32)
+        self._color = numpy.zeros(capacity, dtype=numpy.uint32)  # packed as 0xRRGGBB
+        self._next = 0  # next slot of the ring buffers
+        self._drawn = None  # area covered by the particles on the last frame
+        self._random = numpy.random.default_rng()
+
+    def __len__(self) -> int:
+        """Return the number of particles alive."""
+        return int(numpy.count_nonzero(self._life > 0))
+
+    def emit(self, pos:tuple, count:int, speed:float, life:int, color:pygame.Color) -> None:
+        """Emit particles flying in every direction.
+        pos:    center coordinates
+        count:  number of particles
+        speed:  max speed in pixel
+        life:   lifetime in ticks
+        color:  color of the particles"""
+        slots = numpy.arange(self._next, self._next + count) % self._capacity
+        self._next = (self._next + count) % self._capacity
+        angle = self._random.uniform(0, 2*PI, count)
+        velocity = self._random.uniform(0.2, 1, count) * speed
+        self._x[slots], self._y[slots] = pos
+        self._dx[slots] = velocity * numpy.cos(angle)
+        self._dy[slots] = velocity * numpy.sin(angle)
+        self._life[slots] = self._lifetime[slots] = self._random.uniform(0.5, 1, count) * life
+        self._color[slots] = color.r << 16 | color.g << 8 | color.b
+
+    def update(self) -> None:
+        """Move the particles and age them by a tick."""
+        self._x += self._dx
+        self._y += self._dy
+        self._dx *= PARTICLE_DRAG
+        self._dy *= PARTICLE_DRAG
+        self._life -= 1
+
+    def draw(self, surface:pygame.Surface) -> list:
+        """Draw the particles, fading with their age. Return the changed areas of the surface.
+        surface:    render surface"""
+        changed = [self._drawn] if self._drawn else []
+        self._drawn = None
+        alive = numpy.flatnonzero(self._life > 0)
+        if not len(alive):
+            return changed
+        x = (self._x[alive] * Display.scale).astype(numpy.int32)
+        y = (self._y[alive] * Display.scale).astype(numpy.int32)
+        width, height = surface.get_size()
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        x, y, alive = x[inside], y[inside], alive[inside]
+        if not len(alive):
+            return changed
+        fade = self._life[alive] / self._lifetime[alive]
+        color = self._color[alive]
+        red_shift, green_shift, blue_shift, _ = surface.get_shifts()
+        pixels = pygame.surfarray.pixels2d(surface)
+        pixels[x, y] = ((color >> 16 & 255) * fade).astype(numpy.uint32) << red_shift |\
+                       ((color >> 8 & 255) * fade).astype(numpy.uint32) << green_shift |\
+                       ((color & 255) * fade).astype(numpy.uint32) << blue_shift
+        del pixels  # unlock the surface
+        self._drawn = pygame.Rect(x.min(), y.min(), x.max() - x.min() + 1, y.max() - y.min() + 1)
+        changed.append(self._drawn)
+        return changed
+
+    def clear(self) -> None:
+        """Kill every particle."""
+        self._life[:] = 0
+
+
 class Polygon(sprite.Sprite):
     """All game objects in Euclides are regular polygons.
     This class draws a certain sized and verticed regular polygon on the surface."""
+    SNAPSHOT_FORMAT = "HBhhhhffBBB"  # size, n, x, y, dx, dy, angle, radius, red, green, blue
+    particles = None  # particle system of the game, if numpy is available
+
     def __init__(self, size:int, n:int, pos:tuple) -> None:
         """Prepare a sprite containing the polygon.
         size:   size of containing surface (rectangular area as the polygon is regular)
@@ -234,9 +979,8 @@ class Polygon(sprite.Sprite):
         self._angle = 180
         self._color = pygame.Color(255, 255, 255)
         self._size = size
-        self._image = pygame.Surface((size, size))
-        self._rect = self._image.get_rect(center=pos)
-        self._image.set_colorkey(self.image.get_at((0, 0)))
+        self._rect = pygame.Rect(0, 0, size, size)
+        self._rect.center = pos
         self._draw_polygon()
 
     @property
@@ -264,21 +1008,67 @@ class Polygon(sprite.Sprite):
         """Return the number of vertices."""
         return self._n
 
+    @property
+    def angle(self) -> float:
+        """Return the rotation angle in degrees."""
+        return self._angle
+
+    @property
+    def color(self) -> pygame.Color:
+        """Return the color of the outline."""
+        return self._color
+
+    def show(self, pos:tuple, angle:float, radius:float, color:tuple) -> None:
+        """Show the polygon as it is seen elsewhere, e.g. by a spectator.
+        pos:    center coordinates
+        angle:  rotation angle in degrees
+        radius: radius of circle inside the surface
+        color:  color of the outline"""
+        self._rect.center = pos
+        if (angle, radius, color) != (self._angle, self._radius, tuple(self._color)):
+            self._angle, self._radius, self._color = angle, radius, pygame.Color(color)
+            self._draw_polygon()
+
     def update(self, *args, **kwargs) -> None:
         """Update the polygon."""
         self._rect.centerx += self._dx
         self._rect.centery += self._dy
 
+    def emit(self, count:int, speed:float, life:int) -> None:
+        """Emit particles from the polygon's center, in its color.
+        count:  number of particles
+        speed:  max speed in pixel
+        life:   lifetime in ticks"""
+        if Polygon.particles is not None:
+            Polygon.particles.emit(self._rect.center, count, speed, life, self._color)
+
+    def dump(self) -> tuple:
+        """Return the state of the polygon to be saved, in the order of SNAPSHOT_FORMAT."""
+        return (self._size, self._n, *self._rect.center, self._dx, self._dy, self._angle, self._radius,
+                *self._color[:3])
+
+    def load(self, values:tuple) -> tuple:
+        """Restore the state of the polygon, which has been created with the saved size and n.
+        Return the values left for the subclass.
+        values: saved values in the order of SNAPSHOT_FORMAT"""
+        _, _, x, y, self._dx, self._dy, self._angle, self._radius, *color = values[:11]
+        self._rect.center = x, y
+        self._color = pygame.Color(color)
+        self._draw_polygon()
+        return values[11:]
+
     def _draw_polygon(self) -> None:
-        """Draw the polygon."""
-        self._image.fill(self.image.get_at((0, 0)))
-        pygame.draw.polygon(self._image, self._color, Trig.vertices(self.n, self._size, self._radius, self._angle), 1)
+        """Draw the polygon, that is, pick its image from the atlas."""
+        self._image = Atlas.image(self.n, self._size, self._radius, self._angle, self._color)
 
 
 class Spaceship(Polygon):
     """Spaceships represent the player and its enemies in the game.
     Ships have a hull attribute, which can be degraded through collision with an other spaceship or by having shot
     with a projectile. Generally, the spaceship's hull value is the same as its polygon's vertices."""
+    SNAPSHOT_FORMAT = Polygon.SNAPSHOT_FORMAT + "bb" + Timer.SNAPSHOT_FORMAT  # hull, explosion phase and timer
+    _sounds = None  # damage and bounce off sounds, shared by all ships
+
     def __init__(self, size: int, n: int, pos:tuple) -> None:
         """Prepare a sprite containing the polygon.
         size:   size of containing surface (rectangular area as the polygon is regular)
@@ -289,11 +1079,12 @@ class Spaceship(Polygon):
         self._exploding = n + 1
         self._explosion_timer = Timer(EXPLOSION_COOLDOWN)
 
-        # setup sounds
-        self._ship_damage_sound = mixer.Sound(ENEMY_HULL_DAMAGE)
-        self._ship_damage_sound.set_volume(0.5)
-        self._bounce_off_sound = mixer.Sound(BOUNCE_OFF)
-        self._bounce_off_sound.set_volume(0.5)
+        # setup sounds, loaded only once for all ships
+        if Spaceship._sounds is None:
+            Spaceship._sounds = AssetCache.sound(ENEMY_HULL_DAMAGE), AssetCache.sound(BOUNCE_OFF)
+            for sound in Spaceship._sounds:
+                sound.set_volume(0.5)
+        self._ship_damage_sound, self._bounce_off_sound = Spaceship._sounds
 
     @property
     def is_destroyed(self) -> bool:
@@ -315,20 +1106,43 @@ class Spaceship(Polygon):
         """Return the timer for the explosion."""
         return self._explosion_timer
 
+    def dump(self) -> tuple:
+        """Return the state of the ship to be saved, in the order of SNAPSHOT_FORMAT."""
+        return super().dump() + (self._hull, self._exploding) + self._explosion_timer.dump()
+
+    def load(self, values:tuple) -> tuple:
+        """Restore the state of the ship. Return the values left for the subclass.
+        values: saved values in the order of SNAPSHOT_FORMAT"""
+        values = super().load(values)
+        self._hull, self._exploding = values[:2]
+        self._explosion_timer.load(*values[2:5])
+        return values[5:]
+
     def explode(self) -> None:
-        """Explode the ship, that is, advance the explosion frame."""
-        self._exploding -= 1
-        self._radius *= EXPLOSION_SCALE
+        """Explode the ship, that is, advance the explosion frame. Frames are skipped on degraded quality."""
+        frames = QUALITY_EXPLOSION_STEP if Quality.level >= QUALITY_FEWER_EXPLOSION_FRAMES else 1
+        self._exploding -= frames
+        self._radius *= EXPLOSION_SCALE ** frames
         self._color = self._shadeto(WHITE, self._hull + 1)
         self._draw_polygon()
+        self.emit(DEBRIS, DEBRIS_SPEED, DEBRIS_LIFE)
         self.explosion_timer.reset()
 
     def damage(self) -> None:
-        """Reduce hull by one."""
+        """Reduce hull by one. A destroyed ship, e.g. the exploding player, takes no more damage."""
+        if self.is_destroyed:
+            return
         self._hull -= 1
         self._color = self._shadeto(BLACK, self._hull + 1)
         self._draw_polygon()
-        self._ship_damage_sound.play()
+        self.emit(SPARKS, SPARK_SPEED, SPARK_LIFE)
+        self._play(self._ship_damage_sound)
+
+    def _play(self, sound:mixer.Sound) -> None:
+        """Play a hit sound. On degraded quality it isn't played again while it's playing.
+        sound:  sound to be played"""
+        if Quality.level < QUALITY_SINGLE_SOUNDS or not sound.get_num_channels():
+            sound.play()
 
     def _shadeto(self, color:pygame.Color, amount:int) -> pygame.Color:
         """Return a color that is a shade of the given color."""
@@ -338,6 +1152,8 @@ class Spaceship(Polygon):
 
 class Enemy(Spaceship):
     """Enemies are regular polygons above triangles: rectangles, pentagons, hexagons etc."""
+    SNAPSHOT_FORMAT = Spaceship.SNAPSHOT_FORMAT + Timer.SNAPSHOT_FORMAT  # rotation timer
+
     def __init__(self, size:int, n:int, pos:tuple, speed:int, angle:float) -> None:
         """Initialize an enemy polygon.
         size:   size of containing surface (rectangular area as the polygon is regular)
@@ -360,6 +1176,17 @@ class Enemy(Spaceship):
         """Update the enemy sprite."""
         super().update(*args, **kwargs)
 
+    def dump(self) -> tuple:
+        """Return the state of the enemy to be saved, in the order of SNAPSHOT_FORMAT."""
+        return super().dump() + self._rotation_timer.dump()
+
+    def load(self, values:tuple) -> tuple:
+        """Restore the state of the enemy. Return the values left.
+        values: saved values in the order of SNAPSHOT_FORMAT"""
+        values = super().load(values)
+        self._rotation_timer.load(*values[:3])
+        return values[3:]
+
     def turn_dx(self) -> None:
         """Turn around horizontal movement."""
         self._dx = -self._dx
@@ -371,6 +1198,8 @@ class Enemy(Spaceship):
 
 class Player(Spaceship):
     """Player is represented by a regular triangle-shaped spaceship."""
+    SNAPSHOT_FORMAT = Spaceship.SNAPSHOT_FORMAT + Timer.SNAPSHOT_FORMAT + "?"  # fire rate timer, fires
+
     def __init__(self) -> None:
         """Initialize a triangle, representing the player."""
         super().__init__(PLAYER_SIZE, PLAYER_VERTICES, PLAYER_START_POS)
@@ -399,6 +1228,18 @@ class Player(Spaceship):
         """Update the player sprite. The ship is controlled by mouse movement by its center point."""
         super().update(*args, **kwargs)
 
+    def dump(self) -> tuple:
+        """Return the state of the player to be saved, in the order of SNAPSHOT_FORMAT."""
+        return super().dump() + self._fire_rate_timer.dump() + (self._fires, )
+
+    def load(self, values:tuple) -> tuple:
+        """Restore the state of the player. Return the values left.
+        values: saved values in the order of SNAPSHOT_FORMAT"""
+        values = super().load(values)
+        self._fire_rate_timer.load(*values[:3])
+        self._fires = values[3]
+        return values[4:]
+
     def knockback(self, enemy:Enemy):
         """Player and enemies shouldn't overlap each other, because their hull gets too fast exhausted from collision.
         This method knocks back the enemy sprite avoiding overlapping.
@@ -417,7 +1258,7 @@ class Player(Spaceship):
             overlap = self._rect.right - enemy.rect.left
             enemy.rect.left -= overlap
         if overlap:
-            self._bounce_off_sound.play()
+            self._play(self._bounce_off_sound)
             enemy.turn_dy()
             enemy.turn_dx()
 
@@ -429,6 +1270,8 @@ class Player(Spaceship):
 
 class Projectile(Polygon):
     """The polygon shoots same shaped projectiles."""
+    SNAPSHOT_FORMAT = Polygon.SNAPSHOT_FORMAT + Timer.SNAPSHOT_FORMAT  # rotation timer
+
     def __init__(self, owner:Polygon, speed:int, target:Player=None) -> None:
         """The projectile needs to know who fired it off, to get its size, shape and start poisiton.
         owner:  player on enemy sprite
@@ -445,9 +1288,26 @@ class Projectile(Polygon):
         """Update the projectile sprite."""
         super().update(*args, **kwargs)
 
+    def dump(self) -> tuple:
+        """Return the state of the projectile to be saved, in the order of SNAPSHOT_FORMAT."""
+        return super().dump() + self._rotation_timer.dump()
+
+    def load(self, values:tuple) -> tuple:
+        """Restore the state of the projectile. Its owner isn't needed any more, so the projectile may have been
+        created by Polygon's initializer only. Return the values left.
+        values: saved values in the order of SNAPSHOT_FORMAT"""
+        values = super().load(values)
+        self._rotation_timer = Timer(0)
+        self._rotation_timer.load(*values[:3])
+        return values[3:]
+
 
 class PlainText(sprite.Sprite):
-    """Handle on-screen texts as sprites."""
+    """Handle on-screen texts as sprites.
+    Fonts and rendered texts are shared between the sprites and keyed by the render scale."""
+    _fonts = {}  # fonts by (font name, rendered size)
+    _cache = {}  # rendered texts by (font name, rendered size, text, color)
+
     def __init__(self, font_name, font_size, text, font_color, pos) -> None:
         """Initialize a sprite object.
         font_name:  name of font including its path as string
@@ -455,21 +1315,47 @@ class PlainText(sprite.Sprite):
         text:       text to be displayed
         font_color: use this color to render the text
         pos:        center coordinates"""
-        self._font = font.Font(font_name, font_size)
+        self._font_key = font_name, max(1, round(font_size * Display.scale))
         self._text = text
-        self._font_color = font_color
+        self._font_color = tuple(font_color)
         self._pos = pos
+        self._drawn = None  # text redrawn last time on degraded quality
+        self._skipped = 0  # frames skipped since then
         super().__init__()
 
     @property
     def image(self) -> pygame.Surface:
         """Return the text's surface."""
-        return self._font.render(self._text, True, self._font_color)
+        key = self._font_key + (self._text, self._font_color)
+        image = PlainText._cache.get(key)
+        if image is None:
+            if len(PlainText._cache) >= TEXT_CACHE_SIZE:
+                del PlainText._cache[next(iter(PlainText._cache))]  # drop the oldest text
+            image = AssetCache.text(self._font_key, self._text, self._font_color)
+            if image is None:
+                if self._font_key not in PlainText._fonts:  # fonts are parsed only when a text isn't baked
+                    PlainText._fonts[self._font_key] = font.Font(*self._font_key)
+                image = PlainText._fonts[self._font_key].render(self._text, True, self._font_color)
+            PlainText._cache[key] = image
+        return image
+
+    def redraw(self) -> bool:
+        """Return True if the text should be redrawn on the window on a degraded frame, that is, it's changed or been
+        skipped long enough, otherwise False."""
+        if self._text != self._drawn or self._skipped >= QUALITY_TEXT_REDRAW:
+            self._drawn = self._text
+            self._skipped = 0
+            return True
+        self._skipped += 1
+        return False
 
     @property
     def rect(self) -> pygame.Rect:
-        """Return the text's rect."""
-        return self.image.get_rect(center=self._pos)
+        """Return the text's rect in logical coordinates."""
+        width, height = self.image.get_size()
+        rect = pygame.Rect(0, 0, round(width / Display.scale), round(height / Display.scale))
+        rect.center = self._pos
+        return rect
 
 
 class Score(PlainText):
@@ -508,21 +1394,72 @@ class HiScore(Score):
 
 
 class OnScreen(sprite.RenderUpdates):
-    """Container for on-screen sprite objects."""
+    """Container for on-screen sprite objects.
+    Containers form a render graph: a container added to an other one becomes its child, and is drawn and updated
+    along with it. Sprites added to or killed from a child are rendered accordingly, without adding them again."""
     def __init__(self, *sprites:Polygon) -> None:
         """Uses default initialization.
-        sprites:    any number of sprite objects"""
+        sprites:    any number of sprite objects or containers"""
+        self._children = []
         super().__init__(*sprites)
 
+    @property
+    def total(self) -> int:
+        """Return the number of sprites in the group and all of its children. len() counts the group's own only."""
+        return len(self) + sum(child.total for child in self._children)
+
+    def add(self, *sprites) -> None:
+        """Add sprites to the group, and register containers as children.
+        sprites:    any number of sprite objects or containers"""
+        for item in sprites:
+            if isinstance(item, OnScreen):
+                if item is not self and all(child is not item for child in self._children):
+                    self._children.append(item)
+            else:
+                super().add(item)
+
+    def empty(self) -> None:
+        """Remove all sprites and children."""
+        super().empty()
+        self._children.clear()
+
     def update(self, *args, **kwargs):
-        """Handle sprites within the group.
+        """Handle sprites within the group and its children.
         screen: game's display Surface"""
         screen = kwargs.pop("screen", None)
         assert screen
         changed = self.draw(screen)
         super().update(*args, **kwargs)
+        for child in self._children:
+            changed += child.update(*args, screen=screen, **kwargs)
         return changed
 
+    def draw(self, surface:pygame.Surface) -> list:
+        """Draw the sprites at the render scale. Return the changed areas of the surface.
+        On degraded quality unchanged texts are left out of the changed areas, the window shows them already.
+        surface:    render surface"""
+        lazy_text = Quality.level >= QUALITY_LAZY_TEXT
+        if Display.scale == 1 and not lazy_text:
+            return super().draw(surface)
+        dirty = self.lostsprites
+        self.lostsprites = []
+        for sprite in self.sprites():
+            old_rect = self.spritedict[sprite]
+            new_rect = surface.blit(sprite.image, (round(sprite.rect.x * Display.scale),
+                                                   round(sprite.rect.y * Display.scale)))
+            if lazy_text and new_rect == old_rect and isinstance(sprite, PlainText) and not sprite.redraw():
+                continue
+            if old_rect:
+                if new_rect.colliderect(old_rect):
+                    dirty.append(new_rect.union(old_rect))
+                else:
+                    dirty.append(new_rect)
+                    dirty.append(old_rect)
+            else:
+                dirty.append(new_rect)
+            self.spritedict[sprite] = new_rect
+        return dirty
+
 
 class Exploding(OnScreen):
     """Container for exploding sprite objects."""
@@ -558,7 +1495,7 @@ class Wave(OnScreen):
     def contact(self, player:sprite.Sprite):
         """Detect collision between player and enemy polygons and reduce their hull.
         player:     player sprite"""
-        for enemy in sprite.spritecollide(player, self, False, sprite.collide_circle):
+        for enemy in Collision.spritecollide(player, self, False):
             player.knockback(enemy)
             enemy.damage()
             player.damage()
@@ -569,9 +1506,10 @@ class Wave(OnScreen):
         self._score = 0
         self.reset_level()
 
-    def reset_level(self) -> None:
-        """When player starts a new level."""
-        self._fire_rate_timer = Timer(ENEMY_WAVE_STARTING_FIRE_COOLDOWN)
+    def reset_level(self, cooldown:int=ENEMY_WAVE_STARTING_FIRE_COOLDOWN) -> None:
+        """When player starts a new level.
+        cooldown:   fire cooldown of the wave in milliseconds"""
+        self._fire_rate_timer = Timer(cooldown)
 
 
 class Swarm(OnScreen):
@@ -596,7 +1534,7 @@ class Swarm(OnScreen):
         """Detect collision between projectiles and their target.
         Colliding projectiles get killed off (dokill2=True), target takes damage.
         target:  Wave of spaceship(s)"""
-        for ship in sprite.groupcollide(target, self, False, True, sprite.collide_circle):
+        for ship in Collision.groupcollide(target, self, False, True):
             ship.damage()
             target.increase_score(SCORE_HULL_DAMAGE * ship.n)
             if ship.is_destroyed:
@@ -605,14 +1543,15 @@ class Swarm(OnScreen):
     def harm(self, player:sprite.Sprite):
         """Detect collision between player and enemy fire and reduce hull.
         player:     player sprite"""
-        for _ in sprite.spritecollide(player, self, True, sprite.collide_circle):
+        for _ in Collision.spritecollide(player, self, True):
             player.damage()
 
     def contact(self, hostile_fire):
         """Detect collision between player's and hostile fire.
         hostile_fire:   hostile Swarm of projectiles"""
-        for enemy_projectile in sprite.groupcollide(hostile_fire, self, True, True, collided=sprite.collide_circle):
+        for enemy_projectile in Collision.groupcollide(hostile_fire, self, True, True):
             hostile_fire.increase_score(SCORE_DESTROY_ENEMY * enemy_projectile.n * 2)
+            enemy_projectile.emit(SPARKS, SPARK_SPEED, SPARK_LIFE)
 
     def reset(self):
         """When player restarts the game or reaches a new level."""
@@ -620,6 +1559,830 @@ class Swarm(OnScreen):
         self.empty()
 
 
+Spawn = collections.namedtuple("Spawn", "size n pos speed angle")  # spawn of an enemy, angle in radians
+
+# load of a stress run: number, size, vertices and speed of the enemies, number of enemy projectiles kept on screen,
+# pinned enemy fire cooldown in milliseconds, number of ticks, and the input: bot, sweep or a json file of [x, y, fire]
+Stress = collections.namedtuple("Stress", "enemies size n speed projectiles cooldown ticks input",
+                                defaults=(1000, ENEMY_MIN_SIZE, ENEMY_STARTING_VERTICES, ENEMY_STARTING_SPEED, 0, None,
+                                          600, "bot"))
+
+
+class Snapshot:
+    """Compact versioned binary snapshot of a running game.
+    Sprites aren't pickled: every sprite class dumps its state as a record described by its SNAPSHOT_FORMAT."""
+    MAGIC = b"EUCL"
+    VERSION = 1
+    HEADER = struct.Struct("<4sHIII?")  # magic, version, wave number, wave score, fire score, player is exploding
+    TIMER = struct.Struct("<" + Timer.SNAPSHOT_FORMAT)
+    RANDOM = struct.Struct("<625I?d")  # state of the Mersenne Twister and the next gauss value
+    SPAWN = struct.Struct("<HBhhff")  # size, n, x, y, speed, angle
+    COUNT = struct.Struct("<H")
+    _records = {}  # structs of the sprite classes
+
+    def __init__(self, data:bytes=b"") -> None:
+        """Initialize the snapshot for writing, or for reading the given data.
+        data:   bytes of a saved snapshot"""
+        self._data = bytearray(data)
+        self._offset = 0
+
+    @property
+    def data(self) -> bytes:
+        """Return the bytes of the snapshot."""
+        return bytes(self._data)
+
+    def record(cls:type) -> struct.Struct:
+        """Return the struct of a sprite class.
+        cls:    class with a SNAPSHOT_FORMAT"""
+        if cls not in Snapshot._records:
+            Snapshot._records[cls] = struct.Struct("<" + cls.SNAPSHOT_FORMAT)
+        return Snapshot._records[cls]
+
+    def write(self, record:struct.Struct, *values) -> None:
+        """Append a record.
+        record: struct of the record
+        values: values of the record"""
+        self._data += record.pack(*values)
+
+    def read(self, record:struct.Struct) -> tuple:
+        """Read the next record.
+        record: struct of the record"""
+        values = record.unpack_from(self._data, self._offset)
+        self._offset += record.size
+        return values
+
+    def write_all(self, record:struct.Struct, rows:list) -> None:
+        """Append a counted list of records.
+        record: struct of the records
+        rows:   list of tuples of values"""
+        self.write(Snapshot.COUNT, len(rows))
+        for row in rows:
+            self.write(record, *row)
+
+    def read_all(self, record:struct.Struct) -> list:
+        """Read a counted list of records.
+        record: struct of the records"""
+        count, = self.read(Snapshot.COUNT)
+        return [self.read(record) for _ in range(count)]
+
+    def write_sprites(self, cls:type, sprites:collections.abc.Iterable) -> None:
+        """Append the states of sprites.
+        cls:        class of the sprites
+        sprites:    sprites to save"""
+        self.write_all(Snapshot.record(cls), [sprite_.dump() for sprite_ in sprites])
+
+    def read_sprites(self, cls:type) -> list:
+        """Read and return restored sprites.
+        cls:    class of the sprites, Enemy or Projectile"""
+        sprites = []
+        for values in self.read_all(Snapshot.record(cls)):
+            size, n, x, y = values[:4]
+            if cls is Enemy:
+                restored = Enemy(size, n, (x, y), 0, 0)
+            else:  # projectiles are restored without their owner
+                restored = cls.__new__(cls)
+                Polygon.__init__(restored, size, n, (x, y))
+            restored.load(values)
+            sprites.append(restored)
+        return sprites
+
+    def write_random(self) -> None:
+        """Append the state of the random number generator."""
+        _, internal, gauss = random.getstate()
+        self.write(Snapshot.RANDOM, *internal, gauss is not None, gauss or 0)
+
+    def read_random(self) -> None:
+        """Restore the state of the random number generator."""
+        *internal, has_gauss, gauss = self.read(Snapshot.RANDOM)
+        random.setstate((3, tuple(internal), gauss if has_gauss else None))
+
+
+class WavePlan:
+    """Plan of the enemy waves.
+    The next wave's spawn list is computed ahead of time, either by the difficulty formula or from a data file.
+    Its shapes and enemies are built a few pieces per frame while the actual wave is played."""
+    def __init__(self, filename:str=None, waves:list=None) -> None:
+        """Initialize the wave plan.
+        filename:   path to a json file with a list of waves, each an object with size, n, speed and optionally
+                    spawns as a list of [x, y, angle in degrees]; the formula takes over when the list runs out
+        waves:      list of waves as in the file, instead of the file"""
+        self._waves = waves or []
+        if filename:
+            with open(filename) as waves:
+                self._waves = json.load(waves)
+        self.reset()
+
+    @property
+    def number(self) -> int:
+        """Return the number of the actual wave."""
+        return self._number
+
+    @property
+    def spawns(self) -> list:
+        """Return the spawn list of the next wave."""
+        return self._spawns
+
+    def reset(self, start:int=1) -> None:
+        """When player restarts the game.
+        start:  number of the first wave"""
+        self._number = start - 1
+        self._plan()
+
+    def resume(self, number:int, spawns:list) -> None:
+        """When player resumes a saved game.
+        number: number of the actual wave
+        spawns: spawn list of the next wave"""
+        self._number = number
+        self._spawns = spawns
+        self._enemies = []
+        self._builder = self._build()
+
+    def prewarm(self, steps:int=WAVE_PREWARM_STEPS) -> None:
+        """Do some of the work of building the next wave.
+        steps:  pieces of work to do"""
+        for _ in range(steps):
+            if next(self._builder, None) is None:
+                return
+
+    def next_wave(self) -> list:
+        """Return the enemies of the next wave, and start planning the one after it."""
+        collections.deque(self._builder, maxlen=0)  # finish what's left
+        enemies = self._enemies
+        self._number += 1
+        self._plan()
+        return enemies
+
+    def parameters(self, number:int) -> tuple:
+        """Return size, number of vertices and speed of a wave.
+        number: number of the wave"""
+        if number <= len(self._waves):
+            wave = self._waves[number-1]
+            return wave["size"], wave["n"], wave["speed"]
+        size = max(ENEMY_MIN_SIZE, ENEMY_STARTING_SIZE + number * ENEMY_SIZE_DECREMENT)
+        n = ENEMY_STARTING_VERTICES + number - 1
+        speed = ENEMY_STARTING_SPEED + number * ENEMY_SPEED_INCREMENT
+        return size, n, speed
+
+    def _plan(self) -> None:
+        """Compute the spawn list of the next wave."""
+        number = self._number + 1
+        size, n, speed = self.parameters(number)
+        if number <= len(self._waves) and "spawns" in self._waves[number-1]:
+            spawns = [((x, y), math.radians(angle)) for x, y, angle in self._waves[number-1]["spawns"]]
+        else:
+            spawns = []
+            for _ in range(n):
+                x = random.randrange(0, SCREEN_WIDTH, 1)
+                y = random.randrange(0, SCREEN_HEIGHT // 2, 1)
+                angle = math.radians(random.randrange(315, 345, 1))
+                spawns.append(((x, y), angle))
+        self._spawns = [Spawn(size, n, pos, speed, angle) for pos, angle in spawns]
+        self._enemies = []
+        self._builder = self._build()
+
+    def _build(self) -> collections.abc.Iterator:
+        """Build the shapes and enemies of the next wave, yielding after each piece of work."""
+        shapes = set()
+        for spawn in self._spawns:
+            if (spawn.n, spawn.size) not in shapes:  # every shape is warmed once, however many enemies it has
+                shapes.add((spawn.n, spawn.size))
+                yield from Atlas.warm(spawn.n, spawn.size)
+            self._enemies.append(Enemy(*spawn))
+            yield
+
+
+class Collision:
+    """Collection of collision detection methods.
+    The circle test of pygame is the cheap broadphase. Its candidate pairs are checked exactly by the separating
+    axis theorem, as all polygons are convex."""
+    _hulls = {}  # vertices relative to the sprite's rect, keyed by shape and rotation bucket
+
+    def hull(polygon:Polygon) -> tuple:
+        """Return the vertices of the polygon relative to its rect.
+        polygon:    polygon sprite"""
+        size = polygon.rect.width
+        key = polygon.n, size, Atlas.bucket(polygon.n, polygon.angle)
+        hull = Collision._hulls.get(key)
+        if hull is None:
+            hull = tuple(map(tuple, Trig.vertices(polygon.n, size, size // 2, key[2])))
+            Collision._hulls[key] = hull
+        return hull
+
+    def intersect(a:Polygon, b:Polygon) -> bool:
+        """Return True if the two polygons overlap, otherwise False.
+        a, b:   polygon sprites"""
+        hulls = [[(x + p.rect.x, y + p.rect.y) for x, y in Collision.hull(p)] for p in (a, b)]
+        for hull in hulls:
+            for (x1, y1), (x2, y2) in zip(hull, hull[1:] + hull[:1]):
+                axis_x, axis_y = y1 - y2, x2 - x1  # normal of the edge
+                first, second = ([axis_x*x + axis_y*y for x, y in h] for h in hulls)
+                if max(first) < min(second) or max(second) < min(first):
+                    return False
+        return True
+
+    def narrowphase(pairs:list) -> list:
+        """Return a list of booleans, True for each overlapping pair of polygons.
+        The test runs vectorized over all pairs if numpy is available and there are enough pairs.
+        pairs:  list of tuples of two polygon sprites"""
+        if numpy is None or len(pairs) < NARROWPHASE_BATCH:
+            return [Collision.intersect(a, b) for a, b in pairs]
+        # vertices of shorter hulls are padded by repeating the last one: its edges are zero, so they don't separate
+        size = max(max(a.n, b.n) for a, b in pairs)
+        hulls = numpy.empty((2, len(pairs), size, 2))
+        for i, pair in enumerate(pairs):
+            for j, polygon in enumerate(pair):
+                hull = Collision.hull(polygon)
+                hulls[j, i, :len(hull)] = hull
+                hulls[j, i, len(hull):] = hull[-1]
+                hulls[j, i] += polygon.rect.topleft
+        normals = (numpy.roll(hulls, -1, axis=2) - hulls)[..., ::-1] * (-1, 1)
+        axes = numpy.concatenate((normals[0], normals[1]), axis=1)
+        projections = numpy.einsum("pkd,jpvd->jpkv", axes, hulls)
+        low, high = projections.min(axis=3), projections.max(axis=3)
+        separated = (high[0] < low[1]) | (high[1] < low[0])
+        return (~separated.any(axis=1)).tolist()
+
+    def spritecollide(polygon:Polygon, group:sprite.Group, dokill:bool) -> list:
+        """Return the list of sprites in the group colliding with the polygon, like sprite.spritecollide().
+        polygon:    polygon sprite
+        group:      group of polygon sprites
+        dokill:     remove colliding sprites from all their groups"""
+        candidates = [(polygon, other) for other in sprite.spritecollide(polygon, group, False, sprite.collide_circle)]
+        collided = [other for (_, other), hit in zip(candidates, Collision.narrowphase(candidates)) if hit]
+        if dokill:
+            for other in collided:
+                other.kill()
+        return collided
+
+    def groupcollide(group_a:sprite.Group, group_b:sprite.Group, dokill_a:bool, dokill_b:bool) -> dict:
+        """Return a dictionary of sprites in group_a, with the list of colliding sprites of group_b, like
+        sprite.groupcollide().
+        group_a, group_b:   groups of polygon sprites
+        dokill_a, dokill_b: remove colliding sprites from all their groups"""
+        candidates = [(a, b) for a, hits in sprite.groupcollide(group_a, group_b, False, False,
+                                                                sprite.collide_circle).items() for b in hits]
+        collided = {}
+        for (a, b), hit in zip(candidates, Collision.narrowphase(candidates)):
+            if hit:
+                collided.setdefault(a, []).append(b)
+        for a, hits in collided.items():
+            if dokill_a:
+                a.kill()
+            if dokill_b:
+                for b in hits:
+                    b.kill()
+        return collided
+
+
+class SpectatorServer:
+    """Stream the game to spectators over local TCP connections.
+    Every tick is a message of a length prefix, a header and entity records. Keyframes hold a full record of every
+    entity. The other frames hold full records of the entities new since the last keyframe, per-field deltas against
+    the keyframe of the entities which changed, and the ids removed since. As deltas don't depend on each other, a
+    slow spectator simply skips frames. The server runs its own asyncio loop in a daemon thread, the game thread only
+    encodes and hands the message over."""
+    KEYFRAME, DELTA = 0, 1
+    HEADER = struct.Struct("<BIIIHIII")  # kind, tick, score, hiscore, wave, number of records, deltas, removed ids
+    RECORD = struct.Struct("<IBBHhhHHBBB")  # id, kind, n, size, x, y, angle, radius, red, green, blue
+    NEAR, MOVED, TURNED, SHADED = 1, 2, 4, 8  # changed fields of a delta, in the order they follow its id and mask
+    FIELDS = {NEAR: "bb",  # x, y offsets from the keyframe
+              MOVED: "hh",  # x, y, when the offsets don't fit
+              TURNED: "B",  # angle
+              SHADED: "HBBB"}  # radius, red, green, blue
+    DELTAS = [struct.Struct("<IB" + "".join(formats for field, formats in fields if mask & field))
+              for fields in [FIELDS.items()] for mask in range(16)]  # id, mask and changed fields by mask
+    DELTA_DTYPES = [numpy.dtype(",".join("<" + code for code in delta.format[1:]))
+                    for delta in DELTAS] if numpy else None  # the deltas as packed numpy records
+    CENTER = operator.attrgetter("rect.center")
+    IMAGE = operator.attrgetter("image")
+    LENGTH = struct.Struct("<I")
+    KINDS = {"Player": 0, "Enemy": 1, "Projectile": 2}
+
+    def __init__(self, port:int) -> None:
+        """Start serving spectators.
+        port:   local TCP port"""
+        self._ids = weakref.WeakKeyDictionary()  # stable entity ids
+        self._next_id = itertools.count(1)
+        self._tick = 0
+        self._keyframe = None  # records of the last keyframe by entity, None if a keyframe is due
+        self._keyframe_images = {}  # atlas images of the entities in the last keyframe
+        self._keyframe_arrays = None  # index by entity, ids and records of the last keyframe for vectorized deltas
+        self._look_ids = {}  # look ids by atlas image, as atlas images are kept forever
+        self._looks = []  # angle bucket, radius and color by look id
+        self._look_table = None  # the looks as a numpy array, rebuilt when a new look comes
+        self._keyframe_tick = None
+        self._keyframe_message = None
+        self._clients = {}  # stream writers with the tick of the keyframe they got
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(asyncio.start_server(self._connect, SPECTATOR_HOST, port))
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    @property
+    def spectators(self) -> int:
+        """Return the number of connected spectators."""
+        return len(self._clients)
+
+    def publish(self, entities:collections.abc.Iterable, score:int, hiscore:int, wave:int) -> None:
+        """Encode a tick and hand it over to the server thread.
+        entities:   polygon sprites on screen
+        score:      actual score
+        hiscore:    actual hiscore
+        wave:       number of the actual wave"""
+        self._tick += 1
+        if not self._clients:
+            self._keyframe, self._keyframe_images = None, {}  # nobody to stream to, start with a keyframe on connect
+            return
+        keyframe = self._keyframe is None or self._tick - self._keyframe_tick >= SPECTATOR_KEYFRAME_INTERVAL
+        if keyframe:
+            self._keyframe, self._keyframe_images, self._keyframe_arrays = {}, {}, None
+            for entity in entities:
+                self._keyframe[entity] = self._record(entity)
+                self._keyframe_images[entity] = entity.image
+            self._keyframe_tick = self._tick
+            full = list(itertools.starmap(SpectatorServer.RECORD.pack, self._keyframe.values()))
+            deltas, count, removed = [], 0, []
+        else:
+            full, deltas, count, removed = self._encode_deltas(entities)
+        header = SpectatorServer.HEADER.pack(SpectatorServer.KEYFRAME if keyframe else SpectatorServer.DELTA,
+                                             self._tick, score, hiscore, wave, len(full), count, len(removed))
+        message = b"".join((header, *full, *deltas, struct.pack("<{}I".format(len(removed)), *removed)))
+        message = SpectatorServer.LENGTH.pack(len(message)) + message
+        self._loop.call_soon_threadsafe(self._broadcast, message, self._keyframe_tick, keyframe)
+
+    def _record(self, entity:Polygon) -> tuple:
+        """Return the values of the full record of an entity.
+        entity: polygon sprite"""
+        entity_id = self._ids.get(entity)
+        if entity_id is None:
+            entity_id = self._ids[entity] = next(self._next_id)
+        rect = entity.rect
+        return (entity_id, SpectatorServer.KINDS.get(type(entity).__name__, 255), entity.n, rect.width, rect.centerx,
+                rect.centery, *self._look(entity))
+
+    def _look(self, entity:Polygon) -> tuple:
+        """Return the angle bucket, radius and color of an entity.
+        entity: polygon sprite"""
+        return self._looks[self._look_id(entity)]
+
+    def _look_id(self, entity:Polygon) -> int:
+        """Return the id of the angle bucket, radius and color of an entity, the same for every entity with the same
+        atlas image.
+        entity: polygon sprite"""
+        look_id = self._look_ids.get(entity.image)
+        if look_id is None:
+            color = entity.color
+            look_id = self._look_ids[entity.image] = len(self._looks)
+            self._looks.append((Atlas.bucket(entity.n, entity.angle), round(entity.radius), color.r, color.g, color.b))
+            self._look_table = None
+        return look_id
+
+    def _encode_deltas(self, entities:collections.abc.Collection) -> tuple:
+        """Encode the entities which changed since the last keyframe. Return the full records of the new entities,
+        the deltas of the others as a list of chunks, the number of deltas and the ids removed since the keyframe.
+        The deltas are encoded vectorized if numpy is available and there are enough entities.
+        entities:   polygon sprites on screen, each once"""
+        if numpy is not None and len(entities) >= SPECTATOR_BATCH:
+            return self._encode_batch(entities)
+        full, deltas, present = [], [], set(entities)
+        keyframe, images, formats = self._keyframe, self._keyframe_images, SpectatorServer.DELTAS
+        for entity in present:
+            base = keyframe.get(entity)
+            if base is None:
+                full.append(SpectatorServer.RECORD.pack(*self._record(entity)))
+                continue
+            mask = 0
+            fields = []
+            x, y = entity.rect.center
+            dx, dy = x - base[4], y - base[5]
+            if dx or dy:
+                if -128 <= dx < 128 and -128 <= dy < 128:
+                    mask, fields = SpectatorServer.NEAR, [dx, dy]
+                else:
+                    mask, fields = SpectatorServer.MOVED, [x, y]
+            if entity.image is not images[entity]:
+                looks = self._look(entity)
+                if looks[0] != base[6]:
+                    mask |= SpectatorServer.TURNED
+                    fields.append(looks[0])
+                if looks[1:] != base[7:]:
+                    mask |= SpectatorServer.SHADED
+                    fields.extend(looks[1:])
+            if mask:
+                deltas.append(formats[mask].pack(base[0], mask, *fields))
+        removed = [record[0] for entity, record in keyframe.items() if entity not in present]
+        return full, deltas, len(deltas), removed
+
+    def _encode_batch(self, entities:collections.abc.Collection) -> tuple:
+        """Encode the deltas of the entities vectorized, like _encode_deltas. Only the centers and atlas images are
+        read entity by entity, the deltas are computed and packed in numpy, one chunk for each combination of
+        changed fields.
+        entities:   polygon sprites on screen, each once"""
+        if self._keyframe_arrays is None:
+            fields = len(SpectatorServer.RECORD.format) - 1  # one code for each field after the byte order
+            records = numpy.array(list(self._keyframe.values()), dtype=numpy.int32).reshape(-1, fields)
+            self._keyframe_arrays = dict(zip(self._keyframe, itertools.count())), records
+        index, records = self._keyframe_arrays
+        rows = list(map(index.get, entities))
+        full = []
+        if None in rows:  # new since the keyframe
+            full = [SpectatorServer.RECORD.pack(*self._record(entity))
+                    for entity, row in zip(entities, rows) if row is None]
+            entities = [entity for entity, row in zip(entities, rows) if row is not None]
+            rows = [row for row in rows if row is not None]
+        look_ids = list(map(self._look_ids.get, map(SpectatorServer.IMAGE, entities)))
+        if None in look_ids:  # new looks since the last tick
+            look_ids = [self._look_id(entity) if look_id is None else look_id
+                        for entity, look_id in zip(entities, look_ids)]
+        if self._look_table is None:
+            self._look_table = numpy.array(self._looks, dtype=numpy.int32)
+        count = len(rows)
+        rows = numpy.fromiter(rows, numpy.intp, count)
+        base = records[rows]
+        centers = numpy.fromiter(itertools.chain.from_iterable(map(SpectatorServer.CENTER, entities)), numpy.int32,
+                                 2 * count).reshape(-1, 2)
+        looks = self._look_table[numpy.fromiter(look_ids, numpy.intp, count)]
+        offsets = centers - base[:, 4:6]
+        dx, dy = offsets[:, 0], offsets[:, 1]  # columns are compared one by one, reductions over rows are slower
+        moved = (dx != 0) | (dy != 0)
+        near = moved & ((dx + 128 | dy + 128) >> 8 == 0)  # both offsets fit into int8
+        shaded = functools.reduce(operator.or_, (looks[:, field] != base[:, 6 + field] for field in range(1, 5)))
+        masks = (near * SpectatorServer.NEAR | (moved ^ near) * SpectatorServer.MOVED
+                 | (looks[:, 0] != base[:, 6]) * SpectatorServer.TURNED | shaded * SpectatorServer.SHADED)
+        deltas = []
+        for mask in numpy.unique(masks[masks > 0]).tolist():
+            selected = masks == mask
+            columns = [base[selected, 0], mask]
+            if mask & SpectatorServer.NEAR:
+                columns += list(offsets[selected].T)
+            elif mask & SpectatorServer.MOVED:
+                columns += list(centers[selected].T)
+            if mask & SpectatorServer.TURNED:
+                columns.append(looks[selected, 0])
+            if mask & SpectatorServer.SHADED:
+                columns += list(looks[selected, 1:].T)
+            chunk = numpy.empty(numpy.count_nonzero(selected), SpectatorServer.DELTA_DTYPES[mask])
+            for field, column in zip(chunk.dtype.names, columns):
+                chunk[field] = column
+            deltas.append(chunk.tobytes())
+        kept = numpy.ones(len(records), dtype=bool)
+        kept[rows] = False
+        return full, deltas, numpy.count_nonzero(masks), records[kept, 0].tolist()
+
+    def decode_delta(base:tuple, mask:int, fields:tuple) -> tuple:
+        """Return the record of an entity, from its record in the keyframe and a delta.
+        base:   record values in the keyframe
+        mask:   changed fields of the delta
+        fields: values of the changed fields"""
+        record = list(base)
+        fields = list(fields)
+        if mask & SpectatorServer.NEAR:
+            record[4] += fields.pop(0)
+            record[5] += fields.pop(0)
+        elif mask & SpectatorServer.MOVED:
+            record[4], record[5] = fields.pop(0), fields.pop(0)
+        if mask & SpectatorServer.TURNED:
+            record[6] = fields.pop(0)
+        if mask & SpectatorServer.SHADED:
+            record[7:] = fields
+        return tuple(record)
+
+    def _serve(self) -> None:
+        """Run the server loop until it's stopped, on the server thread."""
+        self._loop.run_forever()
+        self._loop.close()
+
+    def close(self) -> None:
+        """Stop serving spectators, disconnecting them before the server thread stops."""
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+    async def _shutdown(self) -> None:
+        """Close the server and the connections of the spectators, on the server thread."""
+        self._server.close()
+        connections = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for writer in list(self._clients):
+            writer.close()  # the spectator's connection ends as if it left
+        await asyncio.gather(*connections, return_exceptions=True)
+
+    def _broadcast(self, message:bytes, keyframe_tick:int, keyframe:bool) -> None:
+        """Send a message to the spectators able to take it, on the server thread.
+        message:        encoded frame
+        keyframe_tick:  tick of the keyframe the message is based on
+        keyframe:       True if the message is a keyframe"""
+        if keyframe:
+            self._keyframe_message = message
+        for writer, synced in list(self._clients.items()):
+            if writer.transport.get_write_buffer_size() > SPECTATOR_BUFFER:
+                continue  # slow spectator, skip this frame
+            if not keyframe and synced != keyframe_tick:  # spectator missed the keyframe the delta is based on
+                writer.write(self._keyframe_message)
+            writer.write(message)
+            self._clients[writer] = keyframe_tick
+
+    async def _connect(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter) -> None:
+        """Serve a spectator until it disconnects.
+        reader, writer: streams of the connection"""
+        self._clients[writer] = None
+        try:
+            await reader.read()  # spectators don't talk, wait for them to leave
+        except ConnectionError:
+            pass
+        finally:
+            del self._clients[writer]
+            writer.close()
+
+
+class SpectatorView:
+    """Render a game streamed by a spectator server, using the game's own sprites."""
+    def __init__(self, address:str, scale:float=RENDER_SCALE, window_size:tuple=None,
+                 fullscreen:bool=False) -> None:
+        """Connect to the server and show the game.
+        address:        HOST:PORT of the spectator server
+        scale:          render resolution relative to the logical resolution
+        window_size:    tuple of width, height of the window
+        fullscreen:     use the whole screen instead of a window"""
+        host, port = address.rsplit(":", 1)
+        self._socket = socket.create_connection((host or SPECTATOR_HOST, int(port)))
+        self._state = None  # header and records of the latest decoded frame
+        self._streaming = True  # False once the server ended the stream
+        pygame.init()
+        pygame.display.set_caption("Euclides spectator")
+        self._display = Display(scale, window_size, fullscreen)
+        threading.Thread(target=self._receive, daemon=True).start()
+        self._main()
+
+    def _receive(self) -> None:
+        """Read and decode frames on a separate thread, keeping only the latest one."""
+        stream = self._socket.makefile("rb")
+        keyframe = None
+        while True:
+            length = stream.read(SpectatorServer.LENGTH.size)
+            if len(length) < SpectatorServer.LENGTH.size:
+                self._streaming = False
+                return
+            message = stream.read(*SpectatorServer.LENGTH.unpack(length))
+            kind, tick, score, hiscore, wave, count, deltas, removed = SpectatorServer.HEADER.unpack_from(message)
+            offset = SpectatorServer.HEADER.size
+            records = {}
+            for _ in range(count):
+                record = SpectatorServer.RECORD.unpack_from(message, offset)
+                records[record[0]] = record
+                offset += SpectatorServer.RECORD.size
+            if kind == SpectatorServer.KEYFRAME:
+                keyframe = records
+                state = dict(records)
+            elif keyframe is None:
+                continue  # joined in the middle, wait for a keyframe
+            else:
+                state = dict(keyframe)
+                state.update(records)
+                for _ in range(deltas):
+                    entity_id, mask = SpectatorServer.DELTAS[0].unpack_from(message, offset)
+                    delta = SpectatorServer.DELTAS[mask]
+                    if entity_id in keyframe:
+                        state[entity_id] = SpectatorServer.decode_delta(keyframe[entity_id], mask,
+                                                                        delta.unpack_from(message, offset)[2:])
+                    offset += delta.size
+                for entity_id in struct.unpack_from("<{}I".format(removed), message, offset):
+                    state.pop(entity_id, None)
+            self._state = (score, hiscore, wave), state
+
+    def _main(self) -> None:
+        """Show the streamed game until the window is closed or the stream ends."""
+        screen = self._display.surface
+        clock = time.Clock()
+        score = Score(SCORE_FONT, 40, WHITE, SCORE_POS)
+        hiscore = HiScore(SCORE_FONT, 40, WHITE, HISCORE_POS)
+        onscreen = OnScreen(score, hiscore)
+        polygons = {}
+        while True:
+            clock.tick(FPS)
+            for event in pygame.event.get():
+                if event.type == QUIT or event.type == KEYDOWN and event.key == K_ESCAPE:
+                    self._socket.close()
+                    pygame.quit()
+                    return
+            if not self._streaming:
+                self._socket.close()
+                pygame.quit()
+                return
+            if self._state is None:
+                continue  # no keyframe yet
+            (scores, hiscores, _), state = self._state
+            for entity_id in polygons.keys() - state.keys():
+                polygons.pop(entity_id).kill()
+            for entity_id, (_, _, n, size, x, y, angle, radius, *color) in state.items():
+                polygon = polygons.get(entity_id)
+                if polygon is None or polygon.rect.width != size:
+                    if polygon:
+                        polygon.kill()
+                    polygon = polygons[entity_id] = Polygon(size, n, (x, y))
+                    onscreen.add(polygon)
+                polygon.show((x, y), angle, radius, tuple(color))
+            screen.fill(BLACK)
+            changed = onscreen.update(screen=screen, score=scores, hiscore=hiscores)
+            self._display.present(changed)
+
+
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    """Serve the latest metrics of the exporter over HTTP."""
+    def do_GET(self) -> None:
+        """Send the metrics in the OpenMetrics text format."""
+        text = self.server.exporter.text.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/openmetrics-text; version=1.0.0; charset=utf-8")
+        self.send_header("Content-Length", str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def log_message(self, *args) -> None:
+        """Don't log the requests."""
+
+
+class MetricsExporter:
+    """Publish runtime metrics as OpenMetrics text, to a periodically refreshed file and/or on a local HTTP port.
+    The game thread only appends its samples to a deque. Aggregating and publishing them happen on daemon threads,
+    so collecting metrics never costs a frame."""
+    def __init__(self, filename:str=None, port:int=None, interval:float=METRICS_INTERVAL) -> None:
+        """Start the exporter.
+        filename:   path of the metrics file
+        port:       local HTTP port to serve the metrics on
+        interval:   time between two refreshes of the metrics file in seconds"""
+        self._filename = filename
+        self._interval = interval
+        self._samples = collections.deque()  # appends and pops are atomic, no lock needed
+        self._histograms = {}  # bucket counts, sum and count by name
+        self._gauges = {}
+        self._counters = {}  # latest totals by name
+        self._frames = 0
+        self._score = None  # time and value of the score at the last refresh
+        self._text = "# EOF\n"
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        if port:
+            server = http.server.ThreadingHTTPServer((METRICS_HOST, port), MetricsHandler)
+            server.exporter = self
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    @property
+    def text(self) -> str:
+        """Return the latest metrics in the OpenMetrics text format."""
+        return self._text
+
+    def close(self) -> None:
+        """Stop refreshing the metrics, after a last refresh with the samples handed over since the previous one."""
+        self._closed.set()
+        self._thread.join()
+        self._refresh()
+
+    def record(self, histograms:dict=None, gauges:dict=None, counters:dict=None) -> None:
+        """Hand samples over to the exporter. Called on the game thread.
+        histograms: observed values by metric name
+        gauges:     actual values by metric name, labels included in the name
+        counters:   totals counted so far by metric name, without the _total suffix"""
+        self._samples.append((histograms, gauges, counters))
+
+    def _run(self) -> None:
+        """Refresh the metrics periodically."""
+        while not self._closed.wait(self._interval):
+            self._refresh()
+
+    def _refresh(self) -> None:
+        """Aggregate the samples and publish the metrics. A failure is reported, and the next refresh tries again,
+        so the samples keep being taken over."""
+        try:
+            self._aggregate()
+            self._text = self._render()
+            if self._filename:
+                with open(self._filename + ".tmp", "w") as metrics:
+                    metrics.write(self._text)
+                os.replace(self._filename + ".tmp", self._filename)
+        except Exception as error:
+            print("Can't refresh the metrics: {}".format(error), file=sys.stderr)
+
+    def _aggregate(self) -> None:
+        """Take over the samples handed over since the last call."""
+        while self._samples:
+            histograms, gauges, counters = self._samples.popleft()
+            for name, value in (histograms or {}).items():
+                buckets, total, count = self._histograms.get(name, ([0] * len(METRICS_BUCKETS), 0, 0))
+                index = bisect.bisect_left(METRICS_BUCKETS, value)
+                if index < len(buckets):
+                    buckets[index] += 1
+                self._histograms[name] = buckets, total + value, count + 1
+            if gauges:
+                self._frames += 1
+                self._gauges.update(gauges)
+            self._counters.update(counters or {})
+
+    def _render(self) -> str:
+        """Return the aggregated metrics in the OpenMetrics text format."""
+        lines = ["# TYPE euclides_frames counter", "euclides_frames_total {}".format(self._frames)]
+        for name, value in sorted(self._counters.items()):
+            lines += ["# TYPE euclides_{} counter".format(name), "euclides_{}_total {}".format(name, value)]
+        score = self._gauges.get("score")
+        if score is not None:
+            now = timeit.default_timer()
+            if self._score:
+                rate = max(0, (score - self._score[1]) / (now - self._score[0]))
+                lines += ["# TYPE euclides_score_rate gauge", "euclides_score_rate {:.3f}".format(rate)]
+            self._score = now, score
+        for name, (buckets, total, count) in sorted(self._histograms.items()):
+            lines.append("# TYPE euclides_{} histogram".format(name))
+            for bound, cumulative in zip(METRICS_BUCKETS, itertools.accumulate(buckets)):
+                lines.append('euclides_{}_bucket{{le="{}"}} {}'.format(name, bound, cumulative))
+            lines.append('euclides_{}_bucket{{le="+Inf"}} {}'.format(name, count))
+            lines.append("euclides_{}_sum {:.6f}".format(name, total))
+            lines.append("euclides_{}_count {}".format(name, count))
+        typed = set()
+        for name, value in sorted(self._gauges.items()):
+            family = name.split("{")[0]
+            if family not in typed:
+                lines.append("# TYPE euclides_{} gauge".format(family))
+                typed.add(family)
+            lines.append("euclides_{} {}".format(name, float(value)))
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+class FrameProfiler:
+    """Capture call stacks when the frame time spikes.
+    Frame timings are kept in an always-on ring buffer. A frame over budget starts a sampling thread, recording the
+    game thread's call stacks during the next frames. The stacks are written in the collapsed format of flamegraph
+    tools, along with the frame timings and a dump of the game state."""
+    def __init__(self, directory:str, state:callable, budget:float=PROFILE_BUDGET) -> None:
+        """Initialize the profiler on the game thread.
+        directory:  the captures are written here
+        state:      function returning the game state as a dict
+        budget:     frames longer than this trigger a capture in milliseconds"""
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._state = state
+        self._budget = budget
+        self._thread_id = threading.get_ident()
+        self._timings = collections.deque(maxlen=PROFILE_HISTORY)
+        self._last_frame = None
+        self._last_capture = -PROFILE_COOLDOWN
+        self._capture = None  # remaining frames, timings and state of the running capture
+        self._captures = 0
+
+    @property
+    def captures(self) -> int:
+        """Return the number of captures taken."""
+        return self._captures
+
+    def frame(self) -> None:
+        """Record the time since the last frame, and start or advance a capture. Call it once on every frame."""
+        now = timeit.default_timer()
+        if self._last_frame is None:
+            self._last_frame = now
+            return
+        frame_time = (now - self._last_frame) * 1000
+        self._last_frame = now
+        self._timings.append(frame_time)
+        if self._capture:
+            self._capture["frames"] -= 1
+            self._capture["timings_ms"].append(frame_time)
+            if not self._capture["frames"]:
+                self._capture["done"].set()
+                self._capture = None
+        elif frame_time > self._budget and now - self._last_capture > PROFILE_COOLDOWN:
+            self._last_capture = now
+            self._captures += 1
+            self._capture = {
+                "number": self._captures,
+                "frames": PROFILE_FRAMES,
+                "budget_ms": self._budget,
+                "spike_ms": frame_time,
+                "history_ms": list(self._timings),
+                "timings_ms": [],
+                "state": self._state(),
+                "done": threading.Event(),
+            }
+            threading.Thread(target=self._sample, args=(self._capture, ), daemon=True).start()
+
+    def _sample(self, capture:dict) -> None:
+        """Sample the game thread's call stacks until the capture is done, then write it to disk.
+        capture:    the running capture"""
+        stacks = collections.Counter()
+        while not capture["done"].wait(PROFILE_INTERVAL):
+            frame = sys._current_frames().get(self._thread_id)
+            calls = []
+            while frame:
+                code = frame.f_code
+                calls.append("{} ({}:{})".format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            stacks[";".join(reversed(calls))] += 1
+        name = os.path.join(self._directory, "spike-{}-{}".format(os.getpid(), capture["number"]))
+        with open(name + ".folded", "w") as folded:
+            folded.writelines("{} {}\n".format(stack, count) for stack, count in stacks.most_common())
+        del capture["done"], capture["frames"]
+        capture["samples"] = sum(stacks.values())
+        with open(name + ".json", "w") as report:
+            json.dump(capture, report, indent=2)
+
+
 class Pilot:
     """Entry for the hall of fames."""
     def __init__(self, name, score):
@@ -648,6 +2411,7 @@ class HallOfFame:
         filename:       path to shelve file"""
         self._filename = filename
         self._hof = []  # list of Pilots
+        self._write_latency = 0.0
 
     def __str__(self):
         """Return the string representation, each entry in a new line."""
@@ -663,6 +2427,11 @@ class HallOfFame:
         """Return the actual hiscore."""
         return self._hof[HOF_CHART-1].score
 
+    @property
+    def write_latency(self) -> float:
+        """Return the time of the last write to the shelve in seconds."""
+        return self._write_latency
+
     def restore(self) -> None:
         """Restore hall of fame from shelve."""
         with shelve.open(self._filename) as hof:
@@ -692,9 +2461,11 @@ class HallOfFame:
 
     def _save(self) -> None:
         """Write hall of fame to shelve."""
+        start = timeit.default_timer()
         with shelve.open(self._filename) as hof:
             for i in range(HOF_CHART):
                 hof[str(i)] = self._hof[i]
+        self._write_latency = timeit.default_timer() - start
 
 
 class NameEntryDialog(Frame):
@@ -740,13 +2511,50 @@ class NameEntryDialog(Frame):
 
 class Euclides:
     """Main game application."""
-    def __init__(self) -> None:
+    def __init__(self, scale:float=RENDER_SCALE, window_size:tuple=None, fullscreen:bool=False,
+                 waves:str=None, spectators:int=None, save_file:str=None, resume_file:str=None,
+                 metrics_file:str=None, metrics_port:int=None, profile_dir:str=None,
+                 profile_budget:float=PROFILE_BUDGET, asset_dir:str=None, adaptive_quality:bool=True,
+                 benchmark:int=None, stress:Stress=None, frame_budget:float=FRAME_BUDGET) -> None:
+        """Initialize and run the game.
+        scale:          render resolution relative to the logical resolution
+        window_size:    tuple of width, height of the window
+        fullscreen:     use the whole screen instead of a window
+        waves:          path to a json file of planned waves
+        spectators:     local TCP port to stream the game to spectators
+        save_file:      path to save the running game to, on F5 and periodically
+        resume_file:    path of a saved game to start with, if exists
+        metrics_file:   path of an OpenMetrics text file to publish runtime metrics to
+        metrics_port:   local HTTP port to publish runtime metrics on
+        profile_dir:    directory to write call stacks captured on frame time spikes to
+        profile_budget: frames longer than this trigger a capture in milliseconds
+        asset_dir:      directory of baked assets, baked on the first launch
+        adaptive_quality:   degrade the render quality under load, otherwise keep the full quality
+        benchmark:      instead of the game, benchmark fixed and adaptive quality for this many ticks each
+        stress:         instead of the game, play this load as fast as possible; the load of the benchmark if given
+        frame_budget:   time available for one frame in milliseconds, the governor and the quality keep to it"""
+        self._display_options = scale, window_size, fullscreen
+        self._benchmark_ticks = benchmark
+        self._stress = stress
+        self._frame_budget = frame_budget
+        self._frame_times = None  # frame times, quality levels and entities, recorded by benchmarks
+        self._start_wave = 1
+        self._uncapped = False  # frame rate isn't capped by benchmarks
+        self._save_file = save_file
+        self._resume_file = resume_file
+        self._metrics = None
+        if metrics_file or metrics_port:
+            self._metrics = MetricsExporter(metrics_file, metrics_port)
+        self._profiler = FrameProfiler(profile_dir, self._profile_state, profile_budget) if profile_dir else None
+        self._spectators = SpectatorServer(spectators) if spectators else None
+
         # initialize game objects
         random.seed()
         pygame.init()
         mixer.set_num_channels(64)  # continous fire alone needs 20
-        mixer.music.set_volume(0.2)
         pygame.display.set_caption("Euclides")
+        if asset_dir:
+            AssetCache.load(asset_dir, scale, waves)
 
         # restore hall of fame
         self._hall_of_fame = HallOfFame(HOF_FILE)
@@ -754,8 +2562,8 @@ class Euclides:
         self._hiscore = self._hall_of_fame.hiscore
 
         # setup scores
-        self._score = Score("font/Monofett-Regular.ttf", 40, WHITE, SCORE_POS)
-        self._highscore = HiScore("font/Monofett-Regular.ttf", 40, WHITE, HISCORE_POS)
+        self._score = Score(SCORE_FONT, 40, WHITE, SCORE_POS)
+        self._highscore = HiScore(SCORE_FONT, 40, WHITE, HISCORE_POS)
 
         # setup sprite groups
         self._fire = Swarm()  # container for player's projectiles
@@ -763,24 +2571,45 @@ class Euclides:
         self._hostile_fire = Swarm()  # container for enemy projectiles
         self._exploding = Exploding()  # container for exploding spacecrafts
         self._onscreen = OnScreen()  # container for sprites on screen
+        self._wave_plan = WavePlan(waves)  # upcoming enemy waves
+
+        # setup frame-budget governor and render quality
+        self._governor = Governor(frame_budget=frame_budget)
+        self._quality = Quality(adaptive_quality, frame_budget)
 
         # setup sound
-        self._engine_startup = mixer.Sound("wav/engine_startup.wav")
+        self._engine_startup = AssetCache.sound(ENGINE_STARTUP)
         self._engine_startup.set_volume(0.5)
-        self._energy_hum = mixer.Sound("wav/energy_hum.wav")
+        self._energy_hum = AssetCache.sound(ENERGY_HUM)
         self._energy_hum.set_volume(0.5)
-        self._ship_destroyed_sound = mixer.Sound(EXPLOSION)
+        self._ship_destroyed_sound = AssetCache.sound(EXPLOSION)
         self._ship_destroyed_sound.set_volume(1)
+        self._music = MusicManager(TITLE_MUSIC, OVER_MUSIC)
+        self._channels = [mixer.Channel(i) for i in range(mixer.get_num_channels())]
+
+        # setup debris and sparks
+        if numpy:
+            Polygon.particles = Particles()
 
         self._main()
 
     def _main(self) -> None:
         """Execute the application."""
         # setup display
-        screen = pygame.display.set_mode(SCREEN_SIZE)
+        self._display = Display(*self._display_options)
+        screen = self._display.surface
+        self._input = Input(self._display)
+
+        if self._benchmark_ticks or self._stress:
+            if self._benchmark_ticks:
+                self._benchmark(screen, self._benchmark_ticks)
+            else:
+                self._stress_test(screen)
+            self._quit()
+            return
 
         #setup initial state
-        state = State.INTRO
+        state = State.PLAY if self._resume_file and os.path.exists(self._resume_file) else State.INTRO
 
         while True:
             if state == State.INTRO:
@@ -793,9 +2622,17 @@ class Euclides:
                 state = self._end(screen)
 
             if state == State.QUIT:
-                pygame.quit()
+                self._quit()
                 return
 
+    def _quit(self) -> None:
+        """Stop the services of the game and quit pygame."""
+        if self._spectators:
+            self._spectators.close()
+        if self._metrics:
+            self._metrics.close()
+        pygame.quit()
+
     def _set_screen(self, *args) -> None:
         """Set game screen, containers etc.
         args:   screen elements (sprites, containers)"""
@@ -810,100 +2647,210 @@ class Euclides:
     def _intro(self, screen) -> State:
         """Show game title screen.
         screen: pygame display"""
-        title = PlainText("font/RubikMonoOne-Regular.ttf", 60, "EUCLIDES", WHITE, TITLE_POS)
-        subtitle = PlainText("font/ShareTechMono-Regular.ttf", 30, "a geometric shooter", WHITE, SUBTITLE_POS)
-        fame = PlainText("font/ShareTechMono-Regular.ttf", 24, "Hall of Fame", WHITE, FAME_POS)
+        title = PlainText(TITLE_FONT, 60, "EUCLIDES", WHITE, TITLE_POS)
+        subtitle = PlainText(TEXT_FONT, 30, "a geometric shooter", WHITE, SUBTITLE_POS)
+        fame = PlainText(TEXT_FONT, 24, "Hall of Fame", WHITE, FAME_POS)
         hall = OnScreen()
         for i, entry in enumerate(self._hall_of_fame.hof):
-            hall.add(PlainText("font/ShareTechMono-Regular.ttf", 18, str(entry), WHITE, (400, 320+i*18)))
+            hall.add(PlainText(TEXT_FONT, 18, str(entry), WHITE, (400, 320+i*18)))
         self._set_screen(self._score, self._highscore, title, subtitle, fame, hall)
 
         # setup background music
-        mixer.music.fadeout(500)
-        self._title_music = mixer.music.load(TITLE_MUSIC)
-        mixer.music.play(-1)
+        self._music.play(TITLE_MUSIC)
 
         while True:
+            if self._profiler:
+                self._profiler.frame()
+            controls = self._input.poll()
             screen.fill(BLACK)
+            self._music.update()
 
-            if self._player.rect.collidepoint(mouse.get_pos()):
+            on_player = self._player.rect.collidepoint(controls.mouse_pos)
+            if on_player:
                 self._engine_startup.play()
             else:
                 self._engine_startup.fadeout(500)
 
-            for event in pygame.event.get():
-                if event.type == QUIT:  # exit by closing the window
-                    return State.QUIT
-                if event.type == KEYDOWN:
-                    if event.key == K_ESCAPE:  # exit by pressing escape button
-                        return State.QUIT
-                if event.type == MOUSEBUTTONUP and self._player.rect.collidepoint(mouse.get_pos()):
-                    self._engine_startup.stop()
-                    return State.PLAY
-
-            changed = self._onscreen.update(screen=screen, state=State.INTRO, hiscore=self._hiscore)
-            pygame.display.update(changed)
+            if controls.quit:  # exit by closing the window
+                return State.QUIT
+            if K_ESCAPE in controls.keys:  # exit by pressing escape button
+                return State.QUIT
+            if controls.released and on_player:
+                self._engine_startup.stop()
+                return State.PLAY
+
+            changed = self._onscreen.update(screen=screen, state=State.INTRO, hiscore=self._hiscore,
+                                            controls=controls)
+            self._display.present(changed)
+
+    def _save_game(self) -> None:
+        """Write the running game to the save file. The data is flushed to the disk before the file is replaced at once,
+        so a power cut leaves either the old or the new save, never a torn one."""
+        snapshot = Snapshot()
+        snapshot.write(Snapshot.HEADER, Snapshot.MAGIC, Snapshot.VERSION, self._wave_plan.number,
+                       self._hostile.score, self._hostile_fire.score, self._player in self._exploding)
+        snapshot.write(Snapshot.TIMER, *self._hostile.fire_rate_timer.dump())
+        snapshot.write_random()
+        snapshot.write_all(Snapshot.SPAWN, [(spawn.size, spawn.n, *spawn.pos, spawn.speed, spawn.angle)
+                                            for spawn in self._wave_plan.spawns])
+        snapshot.write_sprites(Player, [self._player])
+        snapshot.write_sprites(Enemy, self._hostile)
+        snapshot.write_sprites(Enemy, [ship for ship in self._exploding if ship is not self._player])
+        snapshot.write_sprites(Projectile, self._fire)
+        snapshot.write_sprites(Projectile, self._hostile_fire)
+        with open(self._save_file + ".tmp", "wb") as save_file:
+            save_file.write(snapshot.data)
+            save_file.flush()
+            os.fsync(save_file.fileno())
+        os.replace(self._save_file + ".tmp", self._save_file)
+
+    def _load_game(self, filename:str) -> None:
+        """Restore a saved game on a freshly set screen. The whole file is read before the game is touched, so a
+        truncated or outdated file raises struct.error or ValueError and leaves the game as it was.
+        filename:   path of the saved game"""
+        with open(filename, "rb") as save_file:
+            snapshot = Snapshot(save_file.read())
+        magic, version, number, score, fire_score, player_exploding = snapshot.read(Snapshot.HEADER)
+        if magic != Snapshot.MAGIC or version != Snapshot.VERSION:
+            raise ValueError("{} isn't a version {} saved game".format(filename, Snapshot.VERSION))
+        timer = snapshot.read(Snapshot.TIMER)
+        snapshot.read_random()
+        spawns = [Spawn(size, n, (x, y), speed, angle)
+                  for size, n, x, y, speed, angle in snapshot.read_all(Snapshot.SPAWN)]
+        players = snapshot.read_all(Snapshot.record(Player))
+        if len(players) != 1:
+            raise ValueError("{} holds {} players".format(filename, len(players)))
+        hostile, exploding = snapshot.read_sprites(Enemy), snapshot.read_sprites(Enemy)
+        fire, hostile_fire = snapshot.read_sprites(Projectile), snapshot.read_sprites(Projectile)
+        self._hostile.increase_score(score)
+        self._hostile_fire.increase_score(fire_score)
+        self._hostile.fire_rate_timer.load(*timer)
+        self._wave_plan.resume(number, spawns)
+        self._player.load(players[0])
+        if player_exploding:
+            self._onscreen.remove(self._player)  # rendered by the exploding container
+            self._exploding.add(self._player)
+        self._hostile.add(hostile)
+        self._exploding.add(exploding)
+        self._fire.add(fire)
+        self._hostile_fire.add(hostile_fire)
+
+    def _record_metrics(self, clock:time.Clock) -> None:
+        """Hand the metrics of the last frame over to the exporter.
+        clock:  clock of the game loop"""
+        counts = {"onscreen": self._onscreen.total, "fire": len(self._fire), "hostile": len(self._hostile),
+                  "hostile_fire": len(self._hostile_fire), "exploding": len(self._exploding)}
+        gauges = {'sprites{{group="{}"}}'.format(name): count for name, count in counts.items()}
+        gauges["mixer_channels_busy"] = sum(channel.get_busy() for channel in self._channels)
+        gauges["wave"] = self._wave_plan.number
+        gauges["score"] = self._hostile.score + self._hostile_fire.score
+        gauges.update(self._governor.metrics)
+        gauges.update(self._quality.metrics)
+        gauges.update(self._music.metrics)
+        counters = {**self._governor.counters, **self._quality.counters, **self._music.counters}
+        self._metrics.record({"frame_time_seconds": clock.get_time() / 1000,
+                              "tick_time_seconds": clock.get_rawtime() / 1000}, gauges, counters)
+
+    def _profile_state(self) -> dict:
+        """Return the game state to be dumped along with a profiler capture."""
+        return {
+            "wave": self._wave_plan.number,
+            "onscreen": self._onscreen.total,
+            "fire": len(self._fire),
+            "hostile": len(self._hostile),
+            "hostile_fire": len(self._hostile_fire),
+            "exploding": len(self._exploding),
+            "particles": len(Polygon.particles) if Polygon.particles is not None else 0,
+            "quality_level": Quality.level,
+        }
 
     def _play(self, screen) -> State:
         """Play the game.
         screen: pygame display"""
-        self._set_screen(self._score, self._highscore, self._hostile, self._exploding)
-
-        size = ENEMY_STARTING_SIZE
-        n = 3
-        speed = ENEMY_STARTING_SPEED
+        self._set_screen(self._score, self._highscore, self._hostile, self._exploding, self._fire, self._hostile_fire)
+
+        resumed = False
+        if self._resume_file and os.path.exists(self._resume_file):
+            try:
+                self._load_game(self._resume_file)
+                resumed = True
+            except (OSError, struct.error, ValueError) as error:
+                print("Can't resume {}, starting a new game: {}".format(self._resume_file, error), file=sys.stderr)
+                try:
+                    os.replace(self._resume_file, self._resume_file + ".bad")  # keep it, but don't retry it
+                except OSError:
+                    pass
+            self._resume_file = None  # resume only once
+        if not resumed:
+            self._wave_plan.reset(self._start_wave)
+        autosave_timer = Timer(AUTOSAVE_COOLDOWN)
+        autosave_timer.reset()
+        if Polygon.particles is not None:
+            Polygon.particles.clear()
 
         # setup sounds
-        shot_sound = mixer.Sound(GUNSHOOT)
+        shot_sound = AssetCache.sound(GUNSHOOT)
         shot_sound.set_volume(0.25)
 
         # mute background music
-        mixer.music.fadeout(500)
+        self._music.stop()
+
+        clock = time.Clock()
+        frame_start = None  # when the actual frame's work began, the clock's delay excluded
 
         while True:
-            time.Clock().tick(SLOWMO if self._player.is_exploding else FPS)
+            if self._frame_times is not None and frame_start is not None:  # record the previous frame
+                self._frame_times.append(((timeit.default_timer() - frame_start) * 1000, Quality.level,
+                                          len(self._hostile) + len(self._fire) + len(self._hostile_fire)
+                                          + len(self._exploding)))
+            clock.tick(0 if self._uncapped else SLOWMO if self._player.is_exploding else FPS)
+            frame_start = timeit.default_timer()
+            self._governor.measure(clock.get_rawtime())
+            self._quality.measure(self._governor.frame_time)
+            self._music.update()
+            if self._metrics:
+                self._record_metrics(clock)
+            if self._profiler:
+                self._profiler.frame()
             screen.fill(BLACK)
 
             # listen for user actions
-            for event in pygame.event.get():
-                if event.type == QUIT:  # exit by closing the window
-                    return State.QUIT
-                if event.type == KEYDOWN:
-                    if event.key == K_ESCAPE:  # exit by pressing escape button
-                        return State.QUIT
-                if event.type == MOUSEBUTTONDOWN:
-                    self._player.fires = True  # open fire
-                if event.type == MOUSEBUTTONUP:
-                    self._player.fires = False  # cease fire
+            controls = self._input.poll()
+            if controls.quit:  # exit by closing the window
+                return State.QUIT
+            if K_ESCAPE in controls.keys:  # exit by pressing escape button
+                return State.QUIT
+            if K_F5 in controls.keys and self._save_file:  # save the game
+                self._save_game()
+            self._player.fires = any(controls.buttons)  # fire while a mouse button is held down
 
             # setup enemy wave
             if not bool(self._hostile):
-                self._hostile.reset_level()
+                self._hostile.reset_level(self._governor.starting_cooldown)
                 self._hostile_fire.reset()
-                size += ENEMY_SIZE_DECREMENT
-                n += 1
-                speed += ENEMY_SPEED_INCREMENT
-                for i in range(n):
-                    x = random.randrange(0, SCREEN_WIDTH, 1)
-                    y = random.randrange(0, SCREEN_HEIGHT // 2, 1)
-                    angle = math.radians(random.randrange(315, 345, 1))
-                    self._hostile.add(Enemy(size, n, (x, y), speed, angle))
-                self._onscreen.add(self._hostile)
+                self._hostile.add(*self._wave_plan.next_wave())
+            else:
+                self._wave_plan.prewarm()  # build the next wave while this one is played
+
+            # keep the load of a stress run up
+            if self._stress and len(self._hostile_fire) < self._stress.projectiles and bool(self._hostile):
+                enemies = self._hostile.sprites()
+                self._hostile_fire.add(Projectile(random.choice(enemies), ENEMY_PROJECTILE_STARTING_SPEED, self._player)
+                                       for _ in range(self._stress.projectiles - len(self._hostile_fire)))
 
             # shoot player projectiles
             if self._player.fire_rate_timer.is_ready() and self._player.fires:
                 self._fire.add(Projectile(self._player, PLAYER_PROJECTILE_SPEED))
-                self._onscreen.add(self._fire)
                 self._player.fire_rate_timer.reset()
                 shot_sound.play()
 
             # shoot enemy projectiles
             if self._hostile.fire_rate_timer.is_ready() and bool(self._hostile):
-                enemy = random.choice(list(self._hostile))  # choose a random member from the wave
-                self._hostile_fire.add(Projectile(enemy, ENEMY_PROJECTILE_STARTING_SPEED, self._player))
-                self._onscreen.add(self._hostile_fire)
-                self._hostile.fire_rate_timer.cooldown -= ENEMY_WAVE_FIRE_COOLDOWN_DECREMENT
-                self._hostile.fire_rate_timer.reset()
+                if self._governor.allows_fire(len(self._hostile_fire)):
+                    enemy = random.choice(list(self._hostile))  # choose a random member from the wave
+                    self._hostile_fire.add(Projectile(enemy, ENEMY_PROJECTILE_STARTING_SPEED, self._player))
+                    self._governor.cool_down(self._hostile.fire_rate_timer)
+                self._hostile.fire_rate_timer.reset()  # a denied shot is skipped, not retried on every frame
 
             # check whether player's projectile hits an enemy
             self._fire.hit(self._hostile)
@@ -923,6 +2870,7 @@ class Euclides:
                     self._hostile.remove(ship)
                     self._exploding.add(ship)
             if self._player.is_destroyed:
+                self._onscreen.remove(self._player)  # rendered by the exploding container from now on
                 self._exploding.add(self._player)
 
             # check exploding ships's state
@@ -935,59 +2883,174 @@ class Euclides:
 
             # check if player is still alive
             if not self._player.alive():
+                if self._save_file and os.path.exists(self._save_file):
+                    os.remove(self._save_file)  # nothing to resume
                 return State.GAME_OVER
 
+            # save the game periodically
+            if self._save_file and autosave_timer.is_ready():
+                self._save_game()
+                autosave_timer.reset()
+
             # update sprites
+            hiscore = max(self._hostile.score+self._hostile_fire.score, self._hiscore)
             changed = self._onscreen.update(screen=screen,
                                             state=State.PLAY,
+                                            controls=controls,
                                             score=self._hostile.score,
-                                            hiscore=max(self._hostile.score+self._hostile_fire.score, self._hiscore))
-            pygame.display.update(changed)
+                                            hiscore=hiscore)
+            if Polygon.particles is not None:
+                changed += Polygon.particles.draw(screen)
+                Polygon.particles.update()
+            self._display.present(changed)
+
+            # stream the tick to spectators
+            if self._spectators:
+                entities = dict.fromkeys(itertools.chain((self._player, ), self._hostile, self._fire,
+                                                         self._hostile_fire, self._exploding))
+                self._spectators.publish(entities, self._hostile.score, hiscore, self._wave_plan.number)
+
+    def _benchmark(self, screen, ticks:int) -> None:
+        """Play the same scripted game with fixed and with adaptive quality, then print the frame time distribution
+        of both runs. The game is the stress load if given, otherwise a late wave. A lost game starts over until the
+        script runs out.
+        screen: pygame display
+        ticks:  number of ticks to play in each run"""
+        for adaptive in False, True:
+            if self._stress:
+                script = self._load_stress(self._stress)
+            else:
+                random.seed(BENCHMARK_SEED)
+                self._start_wave = BENCHMARK_WAVE
+                self._governor = Governor(frame_budget=self._frame_budget)
+                script = self._sweep()
+            self._quality = Quality(adaptive, self._frame_budget)
+            self._frame_times = []
+            self._input = ScriptedInput(itertools.islice(script, ticks))
+            while self._play(screen) != State.QUIT:
+                pass
+            self._report("adaptive quality" if adaptive else "fixed quality")
+        self._frame_times = None
+
+    def _stress_test(self, screen) -> None:
+        """Play the load of the stress run as fast as possible for its number of ticks, then print the throughput and
+        the frame time distribution. Every run with the same load spawns the same enemies, a destroyed wave is
+        spawned again, and a lost game starts over.
+        screen: pygame display"""
+        stress = self._stress
+        self._input = ScriptedInput(itertools.islice(self._load_stress(stress), stress.ticks))
+        self._uncapped = True
+        self._frame_times = []
+        start = timeit.default_timer()
+        while self._play(screen) != State.QUIT:
+            pass
+        elapsed = timeit.default_timer() - start
+        self._report("stress {}".format(", ".join("{}={}".format(*option) for option in stress._asdict().items())),
+                     elapsed)
+        self._uncapped = False
+        self._frame_times = None
+
+    def _load_stress(self, stress:Stress) -> collections.abc.Iterable:
+        """Set up the waves and the governor of a stress load, and return its script of controls.
+        stress: load to be played"""
+        random.seed(BENCHMARK_SEED)
+        spawns = [[random.randrange(0, SCREEN_WIDTH), random.randrange(0, SCREEN_HEIGHT // 2),
+                   random.randrange(315, 345)] for _ in range(stress.enemies)]
+        self._wave_plan = WavePlan(waves=[{"size": stress.size, "n": stress.n, "speed": stress.speed,
+                                           "spawns": spawns}] * stress.ticks)
+        self._governor = Governor(PROJECTILE_BUDGET + stress.projectiles, pinned_cooldown=stress.cooldown,
+                                  frame_budget=self._frame_budget)
+        if stress.input == "bot":
+            return self._bot()
+        if stress.input == "sweep":
+            return self._sweep()
+        with open(stress.input) as script_file:
+            return [Controls(mouse_pos=(x, y), buttons=(fire, False, False), pressed=fire, released=not fire)
+                    for x, y, fire in json.load(script_file)]
+
+    def _sweep(self) -> collections.abc.Iterator:
+        """Generate the controls of a scripted pilot, sweeping along the bottom of the screen and firing all the
+        time."""
+        for tick in itertools.count():
+            x = round(SCREEN_WIDTH / 2 + SCREEN_WIDTH / 3 * math.sin(tick / FPS))
+            yield Controls(mouse_pos=(x, PLAYER_START_POS[1]), buttons=(True, False, False), pressed=True)
+
+    def _bot(self) -> collections.abc.Iterator:
+        """Generate the controls of a bot pilot, keeping below an enemy at the bottom of the screen and firing all
+        the time. The enemy is picked without walking the wave, so the bot costs the same for any load."""
+        while True:
+            target = next(iter(self._hostile.spritedict), None)
+            x = target.rect.centerx if target else SCREEN_WIDTH // 2
+            yield Controls(mouse_pos=(x, PLAYER_START_POS[1]), buttons=(True, False, False), pressed=True)
+
+    def _report(self, title:str, elapsed:float=None) -> None:
+        """Print the distribution of the recorded frame times, and the throughput if the time of the run is given.
+        title:      title of the run
+        elapsed:    time of the run in seconds"""
+        frame_times = [frame_time for frame_time, _, _ in self._frame_times]
+        if not frame_times:
+            print("{}: no frames".format(title))
+            return
+        if len(frame_times) > 1:
+            percentiles = statistics.quantiles(frame_times, n=100, method="inclusive")
+        else:
+            percentiles = frame_times * 99  # quantiles need two frames, a single one is every percentile
+        levels = collections.Counter(level for _, level, _ in self._frame_times)
+        over = sum(frame_time > self._frame_budget for frame_time in frame_times)
+        print("{}: {} frames, p50 {:.2f} ms, p90 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms, {:.1%} over budget, "
+              "frames by level {}".format(title, len(frame_times), percentiles[49], percentiles[89], percentiles[98],
+                                          max(frame_times), over / len(frame_times), dict(sorted(levels.items()))))
+        if elapsed:
+            entities = sum(entities for _, _, entities in self._frame_times)
+            print("throughput: {:.1f} ticks/s, {:.0f} entity updates/s, {:.0f} entities on average".format(
+                len(frame_times) / elapsed, entities / elapsed, entities / len(frame_times)))
 
     def _end(self, screen) -> State:
         """Show game over screen.
         screen: pygame display"""
-        game_over_text = PlainText("font/RubikMonoOne-Regular.ttf", 40, "GAME OVER", WHITE, GAME_OVER_POS)
+        game_over_text = PlainText(TITLE_FONT, 40, "GAME OVER", WHITE, GAME_OVER_POS)
         score = self._hostile.score + self._hostile_fire.score
         self._set_screen(self._score, self._highscore, game_over_text)
         text = None
         if self._hall_of_fame.is_new_hiscore(score):
-            text = PlainText("font/ShareTechMono-Regular.ttf", 30, "A new hi-score!", WHITE, NEWHI_POS)
+            text = PlainText(TEXT_FONT, 30, "A new hi-score!", WHITE, NEWHI_POS)
             self._hiscore = score
         elif self._hall_of_fame.is_eligible(score):
-            text = PlainText("font/ShareTechMono-Regular.ttf", 30, "A new entry to the hall of fame!", WHITE, NEWHI_POS)
+            text = PlainText(TEXT_FONT, 30, "A new entry to the hall of fame!", WHITE, NEWHI_POS)
         if text:
             self._onscreen.add(text)
 
         # setup background music
-        self._title_music = mixer.music.load(OVER_MUSIC)
-        mixer.music.play(-1)
+        self._music.play(OVER_MUSIC)
 
         while True:
+            if self._profiler:
+                self._profiler.frame()
+            controls = self._input.poll()
             screen.fill(BLACK)
+            self._music.update()
 
-            if self._player.rect.collidepoint(mouse.get_pos()):
+            on_player = self._player.rect.collidepoint(controls.mouse_pos)
+            if on_player:
                 self._energy_hum.play()
             else:
                 self._energy_hum.fadeout(500)
 
-            for event in pygame.event.get():
-                if event.type == QUIT:  # exit by closing the window
-                    return State.QUIT
-                if event.type == KEYDOWN:
-                    if event.key == K_ESCAPE:  # exit by pressing escape button
-                        return State.QUIT
-                if event.type == MOUSEBUTTONUP and self._player.rect.collidepoint(mouse.get_pos()):
-                    self._energy_hum.stop()
-                    if text:
-                        self._enter_name(score)
-                    return State.INTRO
+            if controls.quit:  # exit by closing the window
+                return State.QUIT
+            if K_ESCAPE in controls.keys:  # exit by pressing escape button
+                return State.QUIT
+            if controls.released and on_player:
+                self._energy_hum.stop()
+                if text:
+                    self._enter_name(score)
+                return State.INTRO
 
             changed = self._onscreen.update(screen=screen,
                                             score=score,
                                             hiscore=self._hiscore,
-                                            mouse_pos=mouse.get_pos())
-            pygame.display.update(changed)
+                                            controls=controls)
+            self._display.present(changed)
 
     def _enter_name(self, score):
         """Enter a name and save to database.
@@ -997,7 +3060,78 @@ class Euclides:
         tk_root.mainloop()
         tk_root.destroy()
         self._hall_of_fame.insert(Pilot(entry.pilot_name, score))
+        if self._metrics:
+            self._metrics.record({"hof_write_seconds": self._hall_of_fame.write_latency})
+
+
+def window_size(value:str) -> tuple:
+    """Parse a window size given as WIDTHxHEIGHT.
+    value:  command line argument"""
+    try:
+        width, height = map(int, value.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("window size should look like 1024x768")
+    return width, height
+
+
+def stress_load(value:str) -> Stress:
+    """Parse a stress load given as comma separated name=value pairs, the load defaults to Stress' defaults.
+    value:  command line argument"""
+    defaults = Stress()
+    options = {}
+    try:
+        for option in filter(None, value.split(",")):
+            name, option_value = (part.strip() for part in option.split("="))
+            if name not in Stress._fields:
+                raise ValueError(name)
+            default = getattr(defaults, name)
+            options[name] = int(option_value) if default is None else type(default)(option_value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("stress load should look like enemies=10000,n=5, with names of {}".format(
+                                         ", ".join(Stress._fields)))
+    return defaults._replace(**options)
 
 
 if __name__ == "__main__":
-    Euclides()
+    parser = argparse.ArgumentParser(description="Euclides, a geometric shooter")
+    parser.add_argument("--scale", type=float, default=RENDER_SCALE,
+                        help="render resolution relative to {}x{}".format(*SCREEN_SIZE))
+    parser.add_argument("--half-res", action="store_const", const=HALF_RESOLUTION, dest="scale",
+                        help="render at half resolution and upscale, for low-power cabinets")
+    parser.add_argument("--window", type=window_size, help="window size as WIDTHxHEIGHT")
+    parser.add_argument("--fullscreen", action="store_true", help="use the whole screen")
+    parser.add_argument("--waves", help="json file of planned enemy waves")
+    parser.add_argument("--spectators", type=int, metavar="PORT", help="stream the game to spectators on this port")
+    parser.add_argument("--spectate", metavar="HOST:PORT", help="watch a game streamed by an other cabinet")
+    parser.add_argument("--save", metavar="FILE", help="save the running game to this file on F5 and periodically")
+    parser.add_argument("--resume", metavar="FILE", help="start with the game saved to this file, if exists")
+    parser.add_argument("--metrics-file", metavar="FILE", help="publish runtime metrics to this OpenMetrics file")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT", help="publish runtime metrics on this HTTP port")
+    parser.add_argument("--profile-dir", metavar="DIR", help="capture call stacks on frame time spikes into DIR")
+    parser.add_argument("--profile-budget", type=float, default=PROFILE_BUDGET, metavar="MS",
+                        help="frames longer than this trigger a capture")
+    parser.add_argument("--assets", metavar="DIR", help="load baked assets from DIR, baking them if needed")
+    parser.add_argument("--bake", action="store_true", help="bake the assets into the --assets directory and exit")
+    parser.add_argument("--fixed-quality", action="store_false", dest="adaptive_quality",
+                        help="keep the full render quality under load")
+    parser.add_argument("--frame-budget", type=float, default=FRAME_BUDGET, metavar="MS",
+                        help="time available for one frame, enemy fire and render quality are throttled to keep it")
+    parser.add_argument("--benchmark", type=int, metavar="TICKS",
+                        help="benchmark fixed and adaptive quality from wave {}, or on the --stress load, and "
+                             "exit".format(BENCHMARK_WAVE))
+    parser.add_argument("--stress", type=stress_load, nargs="?", const=Stress(), metavar="LOAD",
+                        help="play a load like enemies=10000,size=20,n=5,speed=2.5,projectiles=500,cooldown=100,"
+                             "ticks=600,input=bot (or sweep, or a json file of [x, y, fire]) as fast as possible, "
+                             "print throughput and frame times, and exit")
+    args = parser.parse_args()
+    if args.bake:
+        if not args.assets:
+            parser.error("--bake needs an --assets directory")
+        pygame.init()
+        print(AssetCache.bake(args.assets, args.scale, args.waves))
+    elif args.spectate:
+        SpectatorView(args.spectate, args.scale, args.window, args.fullscreen)
+    else:
+        Euclides(args.scale, args.window, args.fullscreen, args.waves, args.spectators, args.save, args.resume,
+                 args.metrics_file, args.metrics_port, args.profile_dir, args.profile_budget, args.assets,
+                 args.adaptive_quality, args.benchmark, args.stress, args.frame_budget)